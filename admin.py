@@ -1,78 +1,104 @@
 import streamlit as st
-import json
-import os
+# Randevular app.py ile aynı veritabanında; filtreleme ve sayfalama sorguda yapılır
+from storage import (
+    DEFAULT_DURUM, ONAY, IPTAL, DURUMLAR,
+    count_randevular, get_randevu_page, get_randevular_by_id, update_randevu_statuses, delete_randevular,
+)
 
-JSON_FILE = "https://masajostim.com.tr/randevular.json"
+PAGE_SIZES = [25, 50, 100]
+TABLO_KOLONLARI = ["id", "tarih", "saat", "ad", "telefon", "masaj_turu", "durum"]
 
-# JSON dosyasından randevuları oku
-def get_randevular():
-    if not os.path.exists(JSON_FILE):
-        return []
-    
-    try:
-        with open(JSON_FILE, 'r') as f:
-            randevular = json.load(f)
-        return randevular
-    except json.JSONDecodeError:
-        return []  # Dosya bozuksa boş liste dön
+# Filtreler
+def filtreler():
+    col1, col2 = st.columns(2)
+    with col1:
+        tarihler = st.date_input("📅 Tarih Aralığı", value=[])
+        durumlar = st.multiselect("Durum", DURUMLAR)
+    with col2:
+        arama = st.text_input("🔎 Ad veya Telefon")
+        page_size = st.selectbox("Sayfa Başına", PAGE_SIZES)
+    start, end = (tarihler[0], tarihler[-1]) if tarihler else (None, None)
+    return (start, end, tuple(durumlar), arama.strip()), page_size
 
-# Randevu durumunu güncelle
-def update_randevu_status(randevu_id, yeni_durum):
-    randevular = get_randevular()
-    
-    for r in randevular:
-        if r["id"] == randevu_id:
-            r["durum"] = yeni_durum
-            break
-    
-    with open(JSON_FILE, 'w') as f:
-        json.dump(randevular, f)
+# Sayfadaki satırlar oturumda tutulur; bir işlemden sonra sadece etkilenen satırlar yeniden okunur
+def sayfa_satirlari(filtre, page, page_size):
+    key = (filtre, page, page_size)
+    cached = st.session_state.get("admin_sayfa")
+    if cached is None or cached["key"] != key:
+        rows = get_randevu_page(*filtre, limit=page_size, offset=(page - 1) * page_size)
+        cached = st.session_state.admin_sayfa = {"key": key, "rows": rows}
+    return cached["rows"]
 
-# Randevuyu sil
-def delete_randevu(randevu_id):
-    randevular = get_randevular()
-    
-    # Seçilen randevuyu listeden kaldır
-    randevular = [r for r in randevular if r["id"] != randevu_id]
-    
-    with open(JSON_FILE, 'w') as f:
-        json.dump(randevular, f)
+def satirlari_guncelle(ids):
+    guncel = get_randevular_by_id(ids)
+    cached = st.session_state.admin_sayfa
+    # Silinen satırlar listeden çıkar, diğerleri yeni halleriyle değişir
+    cached["rows"] = [guncel.get(r["id"], r) if r["id"] in ids else r
+                      for r in cached["rows"] if r["id"] not in ids or r["id"] in guncel]
+    # Seçimi sıfırlamak için tabloya yeni anahtar
+    st.session_state.admin_surum = st.session_state.get("admin_surum", 0) + 1
 
-# Admin paneli
-def admin_page():
-    st.title("🛠️ Randevu Yönetim Paneli")
+# Toplu işlemler tek bir yazma ile kaydedilir
+def toplu_islem(islem, ids):
+    if islem == "onayla":
+        degisen = update_randevu_statuses(ids, ONAY, only_durum=DEFAULT_DURUM)
+    elif islem == "iptal":
+        degisen = update_randevu_statuses(ids, IPTAL, only_durum=DEFAULT_DURUM)
+    else:
+        degisen = delete_randevular(ids)
+    satirlari_guncelle(set(ids))
+    return degisen
 
-    randevular = get_randevular()
-
-    if not randevular:
+# Liste ve işlemler bir fragment: bir işlem sadece bu bölümü yeniden çalıştırır
+@st.fragment
+def randevu_listesi(filtre, page_size):
+    total = count_randevular(*filtre)
+    if not total:
         st.warning("Henüz randevu alınmamış.")
         return
 
-    for randevu in randevular:
-        id, ad, telefon, tarih, saat, masaj_turu, durum = randevu["id"], randevu["ad"], randevu["telefon"], randevu["tarih"], randevu["saat"], randevu["masaj_turu"], randevu["durum"]
-        
-        with st.expander(f"📅 {tarih} 🕒 {saat} - {ad} ({masaj_turu}) [Durum: {durum}]"):
-            st.write(f"📞 **Telefon:** {telefon}")
-            st.write(f"📝 **Masaj Türü:** {masaj_turu}")
+    pages = (total + page_size - 1) // page_size
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page = st.number_input("Sayfa", min_value=1, max_value=pages, value=1)
+    with col2:
+        st.caption(f"{total} randevu, sayfa {page}/{pages}")
+        if st.button("🔄 Yenile"):
+            st.session_state.pop("admin_sayfa", None)
+
+    rows = sayfa_satirlari(filtre, page, page_size)
+    # Tarayıcı sadece görünen satırları çizer; sayfa başına tek bir tablo öğesi gönderilir
+    secim = st.dataframe(
+        [{k: r[k] for k in TABLO_KOLONLARI} for r in rows],
+        hide_index=True,
+        width="stretch",
+        on_select="rerun",
+        selection_mode="multi-row",
+        key=f"admin_tablo_{st.session_state.get('admin_surum', 0)}",
+    )
+    ids = [rows[i]["id"] for i in secim.selection.rows if i < len(rows)]
 
-            # Beklemede olan randevular için işlem butonları
-            if durum == "Beklemede":
-                col1, col2, col3 = st.columns(3)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        onayla = st.button(f"✅ Onayla ({len(ids)})", disabled=not ids)
+    with col2:
+        iptal = st.button(f"❌ İptal Et ({len(ids)})", disabled=not ids)
+    with col3:
+        sil = st.button(f"🗑️ Sil ({len(ids)})", disabled=not ids)
 
-                with col1:
-                    if st.button(f"✅ Onayla {id}"):
-                        update_randevu_status(id, "Onaylandı")
-                        st.experimental_rerun()
-                
-                with col2:
-                    if st.button(f"❌ İptal Et {id}"):
-                        update_randevu_status(id, "İptal Edildi")
-                        st.experimental_rerun()
-                
-                with col3:
-                    if st.button(f"🗑️ Sil {id}"):
-                        delete_randevu(id)
-                        st.experimental_rerun()
+    islem = "onayla" if onayla else "iptal" if iptal else "sil" if sil else None
+    if islem:
+        degisen = toplu_islem(islem, ids)
+        st.session_state.admin_mesaj = f"{degisen} randevu güncellendi."
+        st.rerun(scope="fragment")
+    if "admin_mesaj" in st.session_state:
+        st.success(st.session_state.pop("admin_mesaj"))
+
+# Admin paneli
+def admin_page():
+    st.title("🛠️ Randevu Yönetim Paneli")
+    filtre, page_size = filtreler()
+    randevu_listesi(filtre, page_size)
 
 if __name__ == "__main__":
     admin_page()
@@ -1,37 +1,71 @@
 import streamlit as st
-import sqlite3
+from storage import get_pool, filter_clause
 
-def get_appointments():
-    conn = sqlite3.connect("appointments.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, phone, date, time, massage_type, status FROM appointments")
-    data = cursor.fetchall()
-    conn.close()
-    return data
+DB_FILE = "appointments.db"
+STATUSES = ["Beklemede", "Onaylandı", "İptal Edildi"]
+PAGE_SIZES = [25, 50, 100]
+
+# Each step runs once per database, in order; PRAGMA user_version counts the applied ones
+MIGRATIONS = [
+    """CREATE TABLE IF NOT EXISTS appointments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        phone TEXT,
+        date TEXT,
+        time TEXT,
+        massage_type TEXT,
+        status TEXT DEFAULT 'Beklemede'
+    )""",
+    "CREATE INDEX IF NOT EXISTS appointments_date ON appointments (date, time)",
+    "CREATE INDEX IF NOT EXISTS appointments_status ON appointments (status, date, time)",
+]
+
+def connection():
+    # Connections stay open across reruns; pragmas and migrations run once per connection
+    return get_pool(DB_FILE, migrations=MIGRATIONS).connection()
+
+def count_appointments(start=None, end=None, statuses=None):
+    where, params = filter_clause("date", "status", start, end, statuses)
+    with connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM appointments{where}", params).fetchone()[0]
+
+def get_appointments(start=None, end=None, statuses=None, limit=PAGE_SIZES[0], offset=0):
+    where, params = filter_clause("date", "status", start, end, statuses)
+    with connection() as conn:
+        cursor = conn.execute(
+            "SELECT id, name, phone, date, time, massage_type, status FROM appointments"
+            f"{where} ORDER BY date DESC, time DESC LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        )
+        return [tuple(row) for row in cursor]
 
 def update_appointment_status(appointment_id, status):
-    conn = sqlite3.connect("appointments.db")
-    cursor = conn.cursor()
-    cursor.execute("UPDATE appointments SET status = ? WHERE id = ?", (status, appointment_id))
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        conn.execute("UPDATE appointments SET status = ? WHERE id = ?", (status, appointment_id))
 
 def delete_appointment(appointment_id):
-    conn = sqlite3.connect("appointments.db")
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        conn.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
 
 def admin_page():
     st.title("Randevu Yönetim Paneli")
-    
-    appointments = get_appointments()
-    
-    if not appointments:
+
+    # Filtreler sorguya gider; sadece seçilen sayfa okunur
+    dates = st.date_input("Tarih Aralığı", value=[])
+    start, end = (dates[0], dates[-1]) if dates else (None, None)
+    statuses = st.multiselect("Durum", STATUSES)
+    page_size = st.selectbox("Sayfa Başına", PAGE_SIZES)
+
+    total = count_appointments(start, end, statuses)
+    if not total:
         st.warning("Henüz randevu alınmamış.")
         return
-    
+
+    pages = (total + page_size - 1) // page_size
+    page = st.number_input("Sayfa", min_value=1, max_value=pages, value=1)
+    st.caption(f"{total} randevu, sayfa {page}/{pages}")
+
+    appointments = get_appointments(start, end, statuses, page_size, (page - 1) * page_size)
     for appointment in appointments:
         id, name, phone, date, time, massage_type, status = appointment
         with st.expander(f"{name} - {date} {time} ({massage_type}) [Durum: {status}]"):
@@ -39,18 +73,18 @@ def admin_page():
             st.write(f"**Tarih:** {date}")
             st.write(f"**Saat:** {time}")
             st.write(f"**Masaj Türü:** {massage_type}")
-            
+
             if status == "Beklemede":
                 if st.button("Onayla", key=f"approve_{id}"):
                     update_appointment_status(id, "Onaylandı")
-                    st.experimental_rerun()
+                    st.rerun()
                 if st.button("İptal Et", key=f"cancel_{id}"):
                     update_appointment_status(id, "İptal Edildi")
-                    st.experimental_rerun()
-            
+                    st.rerun()
+
             if st.button("Sil", key=f"delete_{id}"):
                 delete_appointment(id)
-                st.experimental_rerun()
+                st.rerun()
 
 if __name__ == "__main__":
     admin_page()
@@ -0,0 +1,317 @@
+import heapq
+import itertools
+
+import numpy as np
+import pandas as pd
+from decimal import Decimal, getcontext, localcontext
+
+from indicators import SMA_WINDOW, stack_ohlcv, batch_indicators
+from forecast import forecast_next_batch
+from charts import CHART_COLUMNS, CHART_DTYPE
+from timings import StageTimings
+
+# Set higher precision
+getcontext().prec = 50
+
+MIN_CANDLES = 51
+# Buy candidates must also promise at least this expected increase, in percent
+MIN_EXPECTED_INCREASE = 10
+# Symbols per indicator panel. A panel is dropped as soon as its candidates are
+# taken out, so peak memory follows this rather than the number of pairs.
+ANALYSIS_BLOCK_SYMBOLS = 256
+
+def klines_to_frame(klines):
+    df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    df.set_index('timestamp', inplace=True)
+    df = df[['open', 'high', 'low', 'close', 'volume']]
+    df = df.astype(float)
+    return df
+
+def calculate_expected_price(df):
+    if df.empty:
+        return np.nan, np.nan
+
+    price = Decimal(df['close'].iloc[-1])
+    sma_50 = Decimal(df['SMA_50'].iloc[-1])
+
+    if pd.isna(sma_50) or sma_50 == 0:
+        return np.nan, np.nan
+
+    expected_price = price * (1 + (price - sma_50) / sma_50)
+    expected_increase_percentage = ((expected_price - price) / price) * 100 - 1
+
+    return float(expected_price), float(expected_increase_percentage)
+
+def calculate_trade_levels(df, entry_pct=0.02, take_profit_pct=0.05, stop_loss_pct=0.02):
+    if df.empty:
+        return np.nan, np.nan, np.nan
+
+    entry_price = Decimal(df['close'].iloc[-1])
+    take_profit_price = entry_price * (1 + Decimal(take_profit_pct))
+    stop_loss_price = entry_price * (1 - Decimal(stop_loss_pct))
+
+    return float(entry_price), float(take_profit_price), float(stop_loss_price)
+
+# Vectorized float64 versions of the two functions above, for any number of
+# symbols at once. Inputs are arrays (or scalars) of last closes and SMA_50s.
+
+def expected_prices(close, sma_50):
+    close = np.asarray(close, dtype=float)
+    sma_50 = np.asarray(sma_50, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected_price = close * (1 + (close - sma_50) / sma_50)
+        expected_increase_percentage = ((expected_price - close) / close) * 100 - 1
+    invalid = np.isnan(sma_50) | (sma_50 == 0)
+    return np.where(invalid, np.nan, expected_price), np.where(invalid, np.nan, expected_increase_percentage)
+
+def trade_levels(close, entry_pct=0.02, take_profit_pct=0.05, stop_loss_pct=0.02):
+    entry_price = np.asarray(close, dtype=float)
+    return entry_price, entry_price * (1 + take_profit_pct), entry_price * (1 - stop_loss_pct)
+
+# Exact mode, for when the numbers go to an order: Decimal arithmetic on the
+# exchange's own price strings, rounded with the market's precision rules.
+# The strings come from an exchange created with number=str, see
+# async_fetch.create_async_exchange.
+
+def exact_expected_price(price, sma_50):
+    with localcontext() as ctx:
+        ctx.prec = 50
+        price, sma_50 = Decimal(price), Decimal(sma_50)
+        if sma_50 == 0:
+            return None, None
+        expected_price = price * (1 + (price - sma_50) / sma_50)
+        expected_increase_percentage = ((expected_price - price) / price) * 100 - 1
+    return expected_price, expected_increase_percentage
+
+def exact_trade_levels(exchange, symbol, price, entry_pct='0.02', take_profit_pct='0.05', stop_loss_pct='0.02'):
+    """Entry, take-profit and stop-loss as price strings valid for the market."""
+    with localcontext() as ctx:
+        ctx.prec = 50
+        entry_price = Decimal(price)
+        take_profit_price = entry_price * (1 + Decimal(take_profit_pct))
+        stop_loss_price = entry_price * (1 - Decimal(stop_loss_pct))
+    return tuple(exchange.price_to_precision(symbol, str(p)) for p in (entry_price, take_profit_price, stop_loss_price))
+
+def exact_prices(exchange, symbol, closes):
+    """Exact expected price and trade levels from a symbol's close strings, oldest first; None without SMA_50.
+
+    Prices are strings valid for the market, the increase a percentage
+    string.
+    """
+    if len(closes) < SMA_WINDOW:
+        return None
+    with localcontext() as ctx:
+        ctx.prec = 50
+        sma_50 = sum(Decimal(c) for c in closes[-SMA_WINDOW:]) / SMA_WINDOW
+    expected_price, expected_increase_percentage = exact_expected_price(closes[-1], sma_50)
+    if expected_price is None:
+        return None
+    entry_price, take_profit_price, stop_loss_price = exact_trade_levels(exchange, symbol, closes[-1])
+    return {
+        'expected_price': exchange.price_to_precision(symbol, str(expected_price)),
+        'expected_increase_percentage': f'{expected_increase_percentage:.4f}',
+        'entry_price': entry_price,
+        'take_profit_price': take_profit_price,
+        'stop_loss_price': stop_loss_price,
+    }
+
+# Result fields taken from the symbol's last candle
+LAST_ROW_FIELDS = {
+    'price': 'close',
+    'sma_50': 'SMA_50',
+    'rsi_14': 'RSI',
+    'macd_line': 'MACD_Line',
+    'macd_signal': 'MACD_Signal',
+    'bb_upper': 'BB_Upper',
+    'bb_middle': 'BB_Middle',
+    'bb_lower': 'BB_Lower',
+    'atr': 'ATR',
+    'stoch_k': '%K',
+    'stoch_d': '%D',
+}
+RESULT_FIELDS = (
+    ['coin_name'] + list(LAST_ROW_FIELDS)
+    + ['expected_price', 'expected_increase_percentage', 'forecast_next_day_price',
+       'entry_price', 'take_profit_price', 'stop_loss_price']
+)
+
+class ScanResult:
+    """One buy candidate: last-candle values plus the series its chart needs.
+
+    Slotted, so a scan's worth of results carries no per-instance dicts and
+    nothing of the symbol's frame beyond `chart`. `exact` holds the
+    exact-mode prices (see exact_prices) of scans run with exact=True.
+    """
+    __slots__ = RESULT_FIELDS + ['chart', 'exchange', 'venues', 'timeframes', 'exact']
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    def copy(self):
+        return ScanResult(**{name: getattr(self, name) for name in self.__slots__})
+
+    def as_dict(self):
+        # Plain values only, for tables and exports; the chart series stay behind
+        values = {name: getattr(self, name) for name in RESULT_FIELDS}
+        values['exchange'] = self.exchange
+        return values
+
+class TopResults:
+    """The `size` best results by expected_increase_percentage, kept in a min-heap.
+
+    Takes the place of a results list (extend, iteration, len), so memory
+    stays at `size` results however many pairs pass. Iterates best first.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._heap = []
+        self._order = itertools.count()
+
+    def extend(self, results):
+        for result in results:
+            item = (result.expected_increase_percentage, next(self._order), result)
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, item)
+            elif item > self._heap[0]:
+                heapq.heapreplace(self._heap, item)
+
+    def __iter__(self):
+        # Sorted copy, so another thread may keep adding while this one reads
+        return iter([item[2] for item in sorted(self._heap[:], reverse=True)])
+
+    def __len__(self):
+        return len(self._heap)
+
+def make_result(symbol, last, forecast, expected_price, expected_increase_percentage,
+                entry_price, take_profit_price, stop_loss_price, chart):
+    # `last` maps indicator column names to the symbol's last-candle values
+    return ScanResult(
+        coin_name=symbol,
+        expected_price=float(expected_price),
+        expected_increase_percentage=float(expected_increase_percentage),
+        forecast_next_day_price=float(forecast),
+        entry_price=float(entry_price),
+        take_profit_price=float(take_profit_price),
+        stop_loss_price=float(stop_loss_price),
+        # Charts are rendered on demand from these series, see charts.render_chart
+        chart=chart.astype(CHART_DTYPE),
+        **{field: float(last[column]) for field, column in LAST_ROW_FIELDS.items()},
+    )
+
+def analyze_frames(frames, timings=None, block_size=ANALYSIS_BLOCK_SYMBOLS, min_expected_increase=MIN_EXPECTED_INCREASE,
+                   dtype=np.float64):
+    """Batch indicators over frames, then price and forecast the buy candidates.
+
+    Returns (results, errors); errors are (symbol, text key, message) tuples.
+    A block that fails is analyzed again symbol by symbol, so one bad symbol
+    ends up as a 'processing_error' instead of failing the rest.
+    `timings` is anything with a stage(name) context manager.
+    """
+    timings = timings if timings is not None else StageTimings()
+    results, errors = [], []
+    symbols = list(frames)
+    for i in range(0, len(symbols), block_size):
+        block = symbols[i:i + block_size]
+        try:
+            results += analyze_block({s: frames[s] for s in block}, timings, min_expected_increase, dtype)
+        except Exception:
+            for symbol in block:
+                try:
+                    results += analyze_block({symbol: frames[symbol]}, timings, min_expected_increase, dtype)
+                except Exception as e:
+                    errors.append(processing_error(symbol, e))
+    return results, errors
+
+def analyze_block(frames, timings, min_expected_increase=MIN_EXPECTED_INCREASE, dtype=np.float64):
+    results = []
+    with timings.stage('indicators'):
+        panel = batch_indicators(stack_ohlcv(frames, dtype))
+    if not panel['symbols']:
+        return results
+
+    with timings.stage('pricing'):
+        candidates = np.flatnonzero(panel['Buy_Signal'][-1])
+        close = panel['close'][-1, candidates]
+        expected_price, expected_increase_percentage = expected_prices(close, panel['SMA_50'][-1, candidates])
+        keep = expected_increase_percentage >= min_expected_increase
+        candidates, close = candidates[keep], close[keep]
+        expected_price, expected_increase_percentage = expected_price[keep], expected_increase_percentage[keep]
+        entry_price, take_profit_price, stop_loss_price = trade_levels(close)
+
+    with timings.stage('forecast'):
+        forecasts = forecast_next_batch(panel['close'][:, candidates], panel['start'][candidates])
+
+    with timings.stage('results'):
+        for i, j in enumerate(candidates):
+            start = panel['start'][j]
+            last = {column: panel[column][-1, j] for column in LAST_ROW_FIELDS.values()}
+            chart = pd.DataFrame({c: panel[c][start:, j] for c in CHART_COLUMNS}, index=panel['index'][j])
+            results.append(make_result(
+                panel['symbols'][j], last, forecasts[i], expected_price[i], expected_increase_percentage[i],
+                entry_price[i], take_profit_price[i], stop_loss_price[i], chart,
+            ))
+    return results
+
+def processing_error(symbol, error):
+    return (symbol, 'processing_error', f'{type(error).__name__}: {error}')
+
+def parse_klines(klines_by_symbol, timings):
+    frames, errors = {}, []
+    with timings.stage('parse'):
+        for symbol, klines in klines_by_symbol.items():
+            if not klines or len(klines) < MIN_CANDLES:
+                errors.append((symbol, 'insufficient_data', ''))
+                continue
+            try:
+                frames[symbol] = klines_to_frame(klines)
+            except Exception as e:
+                errors.append(processing_error(symbol, e))
+    return frames, errors
+
+def analyze_batch(klines_by_symbol, min_expected_increase=MIN_EXPECTED_INCREASE):
+    # Process pool entry point: raw klines in, picklable results and timings out
+    timings = StageTimings()
+    frames, errors = parse_klines(klines_by_symbol, timings)
+    results, analysis_errors = analyze_frames(frames, timings, min_expected_increase=min_expected_increase)
+    return results, errors + analysis_errors, timings.as_dict()
+
+def compare_with_decimal(close, sma_50, rtol=1e-9, min_expected_increase=MIN_EXPECTED_INCREASE):
+    """Indices where expected_prices/trade_levels disagree with the Decimal functions above.
+
+    A value off by more than `rtol`, or a symbol selected by one side only,
+    counts as a disagreement.
+    """
+    expected_price, expected_increase_percentage = expected_prices(close, sma_50)
+    levels = trade_levels(close)
+    mismatches = []
+    for i, (c, s) in enumerate(zip(close, sma_50)):
+        df = pd.DataFrame({'close': [c], 'SMA_50': [s]})
+        reference = (*calculate_expected_price(df), *calculate_trade_levels(df))
+        actual = (expected_price[i], expected_increase_percentage[i], *(level[i] for level in levels))
+        if (not np.allclose(actual, reference, rtol=rtol, atol=0, equal_nan=True)
+                or (actual[1] >= min_expected_increase) != (reference[1] >= min_expected_increase)):
+            mismatches.append(i)
+    return mismatches
+
+if __name__ == '__main__':
+    import argparse
+    from fake_exchange import synthetic_ohlcv
+
+    parser = argparse.ArgumentParser(description='Check the vectorized pricing against the Decimal functions')
+    parser.add_argument('--symbols', type=int, default=400)
+    parser.add_argument('--candles', type=int, default=306)
+    parser.add_argument('--rtol', type=float, default=1e-9)
+    args = parser.parse_args()
+
+    frames = {f'SYM{i}/USDT': klines_to_frame(synthetic_ohlcv(f'SYM{i}/USDT', args.candles))
+              for i in range(args.symbols)}
+    panel = batch_indicators(stack_ohlcv(frames))
+    # Panel rows of real indicator runs, plus the edge cases the Decimal functions return NaN for
+    close = np.r_[panel['close'][-1], 1.0, 1.0, 1e-8]
+    sma_50 = np.r_[panel['SMA_50'][-1], 0.0, np.nan, 3e-8]
+    mismatches = compare_with_decimal(close, sma_50, args.rtol)
+    print(f'{len(close)} prices, {len(mismatches)} disagree beyond rtol {args.rtol}: {mismatches[:10]}')
+    raise SystemExit(1 if mismatches else 0)
@@ -1,41 +1,46 @@
 import streamlit as st
-import json
-import os
-from datetime import datetime, time, timedelta
+from datetime import datetime, timedelta
+from availability import AvailabilityIndex
+import storage
 
-JSON_FILE = "randevular.json"
+# 📌 Dolu saatler indeksinin veritabanından yeniden kurulma süresi (saniye); başka süreçlerin aldığı saatler böylece yansır
+MUSAITLIK_TTL = 300
+# 📌 Seçilen gün doluysa ilk boş gün bu kadar gün ileriye kadar aranır
+BOS_GUN_ARAMA = 14
 
-# 📌 JSON verilerini yükle
-def load_randevular():
-    if "randevular" not in st.session_state:
-        if os.path.exists(JSON_FILE):
-            try:
-                with open(JSON_FILE, 'r') as f:
-                    st.session_state.randevular = json.load(f)
-            except json.JSONDecodeError:
-                st.session_state.randevular = []
-        else:
-            st.session_state.randevular = []
+# 📌 Dolu saatler indeksi: tüm oturumlar paylaşır, gün başına sabit sürede sorgulanır
+@st.cache_resource(ttl=MUSAITLIK_TTL)
+def get_musaitlik():
+    # Boşalan saatler kaydının konumu önce okunur; indeks kurulurken boşalan bir saat kaçmaz
+    freed_id = storage.last_freed_id()
+    return AvailabilityIndex(storage.get_dolu_saatler(), freed_id)
 
-# 📌 Randevuları kaydet
-def save_randevular():
-    with open(JSON_FILE, 'w') as f:
-        json.dump(st.session_state.randevular, f, indent=4)
+# 📌 Admin panelinde iptal edilen veya silinen randevuların saatleri her çizimde indeksten düşülür
+def musaitlik():
+    index = get_musaitlik()
+    index.remove_freed(storage.get_bosalan_saatler(index.freed_id))
+    return index
 
-# 📌 Yeni randevu ekleme
+# 📌 Yeni randevu ekleme; saat başkası tarafından alındıysa storage.SlotTakenError fırlatır
 def add_randevu(ad, telefon, tarih, saat, masaj_turu):
-    new_randevu = {
+    try:
+        randevu_id = storage.add_randevu(ad, telefon, tarih, saat, masaj_turu)
+    except storage.SlotTakenError:
+        get_musaitlik().add(tarih, saat)
+        raise
+    get_musaitlik().add(tarih, saat)
+    st.session_state.randevularim.append({
+        "id": randevu_id,
         "ad": ad,
         "telefon": telefon,
         "tarih": str(tarih),
         "saat": str(saat),
         "masaj_turu": masaj_turu
-    }
-    st.session_state.randevular.append(new_randevu)
-    save_randevular()
+    })
 
-# 📌 Mevcut randevuları yükle
-load_randevular()
+# 📌 Bu oturumda alınan randevular
+if "randevularim" not in st.session_state:
+    st.session_state.randevularim = []
 
 # 📌 Kullanıcı randevu alma ekranı
 st.markdown(
@@ -66,19 +71,8 @@ ad = st.text_input("Adınız ve Soyadınız")
 telefon = st.text_input("Telefon Numaranız")
 tarih = st.date_input("Randevu Tarihi", min_value=datetime.today())
 
-# 📌 12:00 - 22:00 arasında her saat başı seçenekleri oluştur
-baslangic_saat = time(12, 0)
-bitis_saat = time(22, 0)
-saatler = []
-current_time = baslangic_saat
-
-while current_time < bitis_saat:
-    saatler.append(current_time.strftime("%H:%M"))
-    current_time = (datetime.combine(datetime.today(), current_time) + timedelta(hours=1)).time()
-
-# 📌 Daha önce alınan saatleri kaldır
-alinan_saatler = [r["saat"] for r in st.session_state.randevular if r["tarih"] == str(tarih)]
-uygun_saatler = [saat for saat in saatler if saat not in alinan_saatler]
+# 📌 12:00 - 22:00 arasındaki saat başlarından daha önce alınmamış olanlar
+uygun_saatler = musaitlik().free_slots(tarih)
 
 # 📌 Bugünün tarihi seçildiyse, geçmiş saatleri kaldır
 if tarih == datetime.today().date():
@@ -88,22 +82,30 @@ if tarih == datetime.today().date():
 # 📌 Eğer tüm saatler doluysa
 if not uygun_saatler:
     st.error("⚠️ Bu tarihte tüm saatler dolu veya geçmiş saatler kapalı! Lütfen başka bir gün seçin.")
+    # 📌 Sonraki günlerden ilk boş olanı öner
+    sonraki_gunler = get_musaitlik().free_slots_range(tarih + timedelta(days=1), tarih + timedelta(days=BOS_GUN_ARAMA))
+    ilk_bos_gun = next((gun for gun, saatler in sonraki_gunler.items() if saatler), None)
+    if ilk_bos_gun:
+        st.info(f"💡 En yakın boş gün: {ilk_bos_gun}")
 else:
     saat = st.selectbox("Randevu Saati", uygun_saatler)
     masaj_turu = st.selectbox("Masaj Türü", ["Klasik Masaj (60 dk)", "Medikal Masaj (60 dk)", "Aromaterapi Masajı (60 dk)", "Thai Masajı", "Spor Masajı (50 dk)"])
 
     if st.button("📌 Randevu Al"):
         if ad and telefon:
-            add_randevu(ad, telefon, tarih, saat, masaj_turu)
-            st.success("✅ Randevunuz başarıyla alındı!")
-            st.rerun()
+            try:
+                add_randevu(ad, telefon, tarih, saat, masaj_turu)
+                st.success("✅ Randevunuz başarıyla alındı!")
+                st.rerun()
+            except storage.SlotTakenError:
+                st.error("⚠️ Bu saat az önce başka biri tarafından alındı! Lütfen başka bir saat seçin.")
         else:
             st.error("⚠️ Lütfen tüm alanları doldurun.")
 
 # 📌 Mevcut randevuları listele
 st.write("### 📌 Mevcut Randevularınız")
-if st.session_state.randevular:
-    for r in st.session_state.randevular:
+if st.session_state.randevularim:
+    for r in st.session_state.randevularim:
         st.markdown(f"""
         <div style="padding: 10px; border-radius: 10px; border: 1px solid #ddd; margin-bottom: 10px; font-size: 18px;">
         📅 {r['tarih']} 🕒 {r['saat']} - {r['masaj_turu']}
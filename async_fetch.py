@@ -0,0 +1,241 @@
+import asyncio
+import random
+import time
+import ccxt
+import ccxt.async_support as ccxt_async
+
+from candle_store import FETCH_LIMIT, resume_cursor, merge_fetched
+
+FETCH_CONCURRENCY = 16
+FETCH_RETRIES = 3
+RETRY_BACKOFF = 0.5
+
+
+class TokenBucket:
+    """Async token bucket; `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def for_exchange(cls, exchange, capacity=1):
+        # ccxt's rateLimit is the minimum delay between requests in milliseconds
+        return cls(1000.0 / max(exchange.rateLimit, 1), capacity)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def create_async_exchange(exchange_code, markets=None, exact=False):
+    # Throttling is done by TokenBucket, so ccxt's own limiter is switched off.
+    # With `exact`, prices come back as the exchange's strings instead of floats.
+    config = {'enableRateLimit': False}
+    if exact:
+        config['number'] = str
+    exchange = getattr(ccxt_async, exchange_code)(config)
+    if markets:
+        # Otherwise the first fetch_ohlcv runs load_markets() again
+        exchange.set_markets(markets)
+    return exchange
+
+
+def response_bytes(exchange, page):
+    # ccxt keeps the last response body; sessions are shared, so under concurrency this is approximate
+    body = getattr(exchange, 'last_http_response', None)
+    if isinstance(body, (str, bytes)):
+        return len(body)
+    # About 60 bytes per candle as JSON, for exchanges that do not keep the body
+    return 60 * len(page or ())
+
+
+async def fetch_with_retry(exchange, limiter, symbol, interval, since, limit,
+                           retries=FETCH_RETRIES, backoff=RETRY_BACKOFF, timings=None):
+    for attempt in range(retries + 1):
+        await limiter.acquire()
+        started = time.perf_counter()
+        try:
+            page = await exchange.fetch_ohlcv(symbol, interval, since=since, limit=limit)
+        except ccxt.NetworkError as e:
+            # Timeouts, rate-limit and DDoS responses are all NetworkError subclasses
+            if timings is not None:
+                timings.add('request', time.perf_counter() - started)
+                timings.incr('requests')
+                timings.incr('request_errors')
+                if isinstance(e, (ccxt.RateLimitExceeded, ccxt.DDoSProtection)):
+                    timings.incr('rate_limit_hits')
+            if attempt == retries:
+                raise
+            if timings is not None:
+                timings.incr('retries')
+            await asyncio.sleep(backoff * 2 ** attempt * (1 + random.random()))
+        else:
+            if timings is not None:
+                timings.add('request', time.perf_counter() - started)
+                timings.incr('requests')
+                timings.incr('bytes_received', response_bytes(exchange, page))
+            return page
+
+
+async def fetch_symbol(exchange, limiter, symbol, interval, since, store=None, limit=FETCH_LIMIT, memo=None,
+                       timings=None):
+    if memo is not None:
+        klines = memo.get(exchange.id, symbol, interval, since)
+        if klines is not None:
+            if timings is not None:
+                timings.incr('memo_hits')
+            return klines
+    klines = await download_symbol(exchange, limiter, symbol, interval, since, store, limit, timings)
+    if memo is not None:
+        memo.put(exchange.id, symbol, interval, since, klines)
+    return klines
+
+
+async def fetch_pages(exchange, limiter, symbol, interval, cursor, limit=FETCH_LIMIT, timings=None):
+    # Pages until caught up, so a window longer than one page (e.g. the base
+    # candles of a multi-timeframe scan) comes back whole
+    pages = []
+    while True:
+        page = await fetch_with_retry(exchange, limiter, symbol, interval, cursor, limit, timings=timings)
+        if not page:
+            break
+        pages.extend(page)
+        if len(page) < limit or page[-1][0] < cursor:
+            break
+        cursor = page[-1][0] + 1
+    return pages
+
+
+async def download_symbol(exchange, limiter, symbol, interval, since, store=None, limit=FETCH_LIMIT, timings=None):
+    if store is None:
+        return await fetch_pages(exchange, limiter, symbol, interval, since, limit, timings)
+    # Scans sharing a base interval run concurrently on the same files. Tasks
+    # of this loop wait for each other here; merge_fetched and resume_cursor
+    # also take the thread lock, against other threads and loops.
+    async with store.async_lock(exchange.id, symbol, interval):
+        last, cursor = await asyncio.to_thread(resume_cursor, store, exchange.id, symbol, interval, since)
+        pages = await fetch_pages(exchange, limiter, symbol, interval, cursor, limit, timings)
+        candles = await asyncio.to_thread(merge_fetched, store, exchange.id, symbol, interval, since, last, pages,
+                                          None)
+    return candles.tolist()
+
+
+async def stream_ohlcv(exchange, symbols, interval, since, store=None,
+                       concurrency=FETCH_CONCURRENCY, limiter=None, memo=None, timings=None):
+    """Yield (symbol, klines, error) for every symbol as soon as its fetch finishes.
+
+    At most `concurrency` requests are in flight, all sharing one exchange
+    session and one token bucket. `timings` (timings.StageTimings) gets a
+    'request' latency per HTTP call and request, retry, rate-limit and byte
+    counters.
+    """
+    limiter = limiter or TokenBucket.for_exchange(exchange)
+    pending = asyncio.Queue()
+    for symbol in symbols:
+        pending.put_nowait(symbol)
+    # Bounded, so workers stop fetching while the consumer is busy
+    done = asyncio.Queue(maxsize=concurrency)
+
+    async def worker():
+        while True:
+            try:
+                symbol = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                klines = await fetch_symbol(exchange, limiter, symbol, interval, since, store, memo=memo, timings=timings)
+                await done.put((symbol, klines, None))
+            except Exception as e:
+                await done.put((symbol, None, e))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(symbols)))]
+    try:
+        for _ in range(len(symbols)):
+            yield await done.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def _benchmark(symbol_count, latency, concurrency, rate_limit, error_rate):
+    from fake_exchange import FakeAsyncExchange
+
+    symbols = [f'SYM{i}/USDT' for i in range(symbol_count)]
+    exchange = FakeAsyncExchange(symbols, latency=latency, rate_limit=rate_limit, error_rate=error_rate)
+    started = time.perf_counter()
+    arrivals, failures = [], 0
+    async for symbol, klines, error in stream_ohlcv(exchange, symbols, '4h', 0, concurrency=concurrency):
+        arrivals.append(time.perf_counter() - started)
+        failures += error is not None
+    total = time.perf_counter() - started
+    print(f'symbols: {symbol_count}  requests: {exchange.requests}  failed: {failures}')
+    print(f'total: {total:.2f}s  throughput: {symbol_count / total:.1f} symbols/s')
+    print(f'first result: {arrivals[0]:.3f}s  median: {sorted(arrivals)[len(arrivals) // 2]:.3f}s')
+
+
+async def _check_store(interval='4h'):
+    # Store path against a fake exchange; raises AssertionError on a mismatch
+    import tempfile
+    from candle_store import CandleStore
+    from fake_exchange import FakeAsyncExchange, INTERVAL_MS
+
+    step = INTERVAL_MS[interval]
+    exchange = FakeAsyncExchange(['SYM/USDT'], candles=2500, interval=interval, latency=0, jitter=0, rate_limit=1)
+    end = exchange._klines['SYM/USDT'][-1][0]
+    limiter = TokenBucket(1000)
+    with tempfile.TemporaryDirectory() as root:
+        store = CandleStore(root)
+        short = await download_symbol(exchange, limiter, 'SYM/USDT', interval, end - 306 * step, store)
+        # A longer window, e.g. a confluence scan after the default one, backfills the older candles
+        long = await download_symbol(exchange, limiter, 'SYM/USDT', interval, end - 2199 * step, store)
+        assert (len(short), len(long)) == (307, 2200), (len(short), len(long))
+        # History older than the exchange has is not fetched whole again on every run
+        requests = exchange.requests
+        every = await download_symbol(exchange, limiter, 'SYM/USDT', interval, end - 5000 * step, store)
+        again = await download_symbol(exchange, limiter, 'SYM/USDT', interval, end - 4999 * step, store)
+        assert len(every) == len(again) == 2500 and exchange.requests - requests == 4, exchange.requests - requests
+
+        # Concurrent downloads of one file, from this loop and from other threads' loops
+        def other_loop(offset):
+            return asyncio.run(download_symbol(exchange, TokenBucket(1000), 'SYM/USDT', interval,
+                                               end - offset * step, store))
+
+        for _ in range(20):
+            offsets = [random.randrange(1, 2500) for _ in range(8)]
+            results = await asyncio.gather(
+                *(download_symbol(exchange, limiter, 'SYM/USDT', interval, end - o * step, store) for o in offsets[:4]),
+                *(asyncio.to_thread(other_loop, o) for o in offsets[4:]),
+            )
+            assert [len(r) for r in results] == [o + 1 for o in offsets], offsets
+        stored = store.load(exchange.id, 'SYM/USDT', interval)['timestamp']
+        assert len(stored) == 2500 and (stored[1:] > stored[:-1]).all()
+    print('store check passed')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the async fetch stage against a fake exchange')
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--concurrency', type=int, default=FETCH_CONCURRENCY)
+    parser.add_argument('--rate-limit', type=int, default=10, help='ms between requests')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--check', action='store_true', help='check the candle store path instead')
+    args = parser.parse_args()
+    if args.check:
+        asyncio.run(_check_store())
+    else:
+        asyncio.run(_benchmark(args.symbols, args.latency, args.concurrency, args.rate_limit, args.error_rate))
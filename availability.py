@@ -0,0 +1,110 @@
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+# Bookable hours: one slot at the start of every hour from OPEN_HOUR until CLOSE_HOUR
+OPEN_HOUR = 12
+CLOSE_HOUR = 22
+SLOTS = tuple(f'{hour:02d}:00' for hour in range(OPEN_HOUR, CLOSE_HOUR))
+SLOT_BITS = {slot: 1 << i for i, slot in enumerate(SLOTS)}
+# Free slots for every possible occupancy bitmap, so a lookup is one index per day
+FREE_SLOTS = tuple(tuple(slot for slot in SLOTS if not mask & SLOT_BITS[slot]) for mask in range(1 << len(SLOTS)))
+BOOKING_COUNTS = [1000, 10000, 100000]
+
+
+class AvailabilityIndex:
+    """Occupied hours per date as a bitmap, so free slots cost the same however long the history is.
+
+    Built from (tarih, saat) pairs as stored in the bookings ("2025-03-01",
+    "14:00"). Hours outside SLOTS never block a slot and are not kept.
+    `freed_id` is the last storage.get_bosalan_saatler row applied.
+    """
+
+    def __init__(self, dolu_saatler=(), freed_id=0):
+        self.days = {}
+        self.freed_id = freed_id
+        for tarih, saat in dolu_saatler:
+            self.add(tarih, saat)
+
+    def add(self, tarih, saat):
+        bit = SLOT_BITS.get(str(saat))
+        if bit is not None:
+            tarih = str(tarih)
+            self.days[tarih] = self.days.get(tarih, 0) | bit
+
+    def remove(self, tarih, saat):
+        bit = SLOT_BITS.get(str(saat))
+        tarih = str(tarih)
+        if bit is not None and tarih in self.days:
+            mask = self.days[tarih] & ~bit
+            if mask:
+                self.days[tarih] = mask
+            else:
+                del self.days[tarih]
+
+    def remove_freed(self, freed):
+        # (id, tarih, saat) rows of slots freed elsewhere, oldest first
+        for freed_id, tarih, saat in freed:
+            self.remove(tarih, saat)
+            self.freed_id = max(self.freed_id, freed_id)
+
+    def free_slots(self, tarih):
+        return list(FREE_SLOTS[self.days.get(str(tarih), 0)])
+
+    def free_slots_range(self, start, end):
+        """Free slots for every date from start to end inclusive, as {date string: slots}."""
+        days = (end - start).days + 1
+        return {str(d): self.free_slots(d) for d in (start + timedelta(days=i) for i in range(days))}
+
+
+def synthetic_randevular(count, days=3650, seed=0):
+    rng = random.Random(seed)
+    first = date.today() - timedelta(days=days)
+    return [{'tarih': str(first + timedelta(days=rng.randrange(days + 30))), 'saat': rng.choice(SLOTS)}
+            for _ in range(count)]
+
+
+def scan_free_slots(randevular, tarih):
+    # What the booking page did before the index: every booking, every render
+    alinan_saatler = [r['saat'] for r in randevular if r['tarih'] == str(tarih)]
+    return [saat for saat in SLOTS if saat not in alinan_saatler]
+
+
+def benchmark(counts=BOOKING_COUNTS, renders=200):
+    tarih = date.today()
+    rows = []
+    for count in counts:
+        randevular = synthetic_randevular(count)
+        started = time.perf_counter()
+        index = AvailabilityIndex((r['tarih'], r['saat']) for r in randevular)
+        build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(renders):
+            expected = scan_free_slots(randevular, tarih)
+        scan = (time.perf_counter() - started) / renders
+
+        started = time.perf_counter()
+        for _ in range(renders):
+            free = index.free_slots(tarih)
+        lookup = (time.perf_counter() - started) / renders
+
+        assert free == expected
+        rows.append((count, build, scan, lookup))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time free-slot lookups against a growing booking history')
+    parser.add_argument('--bookings', type=int, nargs='+', default=BOOKING_COUNTS)
+    parser.add_argument('--renders', type=int, default=200, help='lookups timed per booking count')
+    args = parser.parse_args()
+
+    print(f"{'bookings':>10} {'index build ms':>15} {'list scan us':>13} {'index us':>9}")
+    for count, build, scan, lookup in benchmark(args.bookings, args.renders):
+        print(f'{count:>10} {build * 1e3:>15.1f} {scan * 1e6:>13.1f} {lookup * 1e6:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from indicators import SMA_WINDOW, stack_ohlcv, batch_indicators, _rolling
+from analysis import MIN_CANDLES, MIN_EXPECTED_INCREASE, klines_to_frame, expected_prices, trade_levels
+from candle_store import CandleStore
+
+# Taker fee and slippage, each charged on both the entry and the exit
+BACKTEST_FEE = 0.001
+BACKTEST_SLIPPAGE = 0.0005
+# Parameter sets simulated together in one pass over the bars
+SWEEP_CHUNK_SIZE = 8
+
+# The live scanner's settings: generate_signals, the expected-increase filter
+# and calculate_trade_levels' defaults
+DEFAULT_PARAMS = {
+    'sma_window': SMA_WINDOW,
+    'rsi_threshold': 70,
+    'min_expected_increase': MIN_EXPECTED_INCREASE,
+    'take_profit_pct': 0.05,
+    'stop_loss_pct': 0.02,
+}
+STAT_COLUMNS = ['trades', 'win_rate', 'avg_trade_return', 'total_return', 'max_drawdown', 'profit_factor', 'open_at_end']
+
+
+def load_panel(exchange_id, symbols, interval, store=None):
+    """Indicator panel over the full stored history of `symbols`."""
+    store = store if store is not None else CandleStore()
+    frames = {}
+    for symbol in symbols:
+        candles = store.load(exchange_id, symbol, interval)
+        if len(candles) >= MIN_CANDLES:
+            frames[symbol] = klines_to_frame(candles.tolist())
+    return batch_indicators(stack_ohlcv(frames))
+
+
+def stored_symbols(exchange_id, interval, store=None):
+    store = store if store is not None else CandleStore()
+    directory = os.path.join(store.root, exchange_id, interval)
+    if not os.path.isdir(directory):
+        return []
+    # CandleStore.path turns BTC/USDT into BTC_USDT.bin
+    names = [name[:-len('.bin')] for name in os.listdir(directory) if name.endswith('.bin')]
+    return sorted('/'.join(name.rsplit('_', 1)) for name in names if '_' in name)
+
+
+def signal_arrays(panel, sma_window=SMA_WINDOW, rsi_threshold=70, min_expected_increase=MIN_EXPECTED_INCREASE,
+                  sma=None):
+    """Buy and sell signals for every bar, as generate_signals plus the scan's expected-increase filter."""
+    close = panel['close']
+    if sma is None:
+        sma = panel['SMA_50'] if sma_window == SMA_WINDOW else _rolling(close, sma_window, np.mean)
+    _, increase = expected_prices(close, sma)
+    with np.errstate(invalid='ignore'):
+        buy = ((close > sma) & (panel['MACD_Line'] > panel['MACD_Signal']) & (panel['%K'] > panel['%D'])
+               & (panel['%K'] > 20) & (increase >= min_expected_increase))
+        sell = (close < sma) & (panel['RSI'] > rsi_threshold)
+    return buy, sell
+
+
+def simulate(panel, buy, sell, take_profit_pct, stop_loss_pct, fee=BACKTEST_FEE, slippage=BACKTEST_SLIPPAGE):
+    """Replay signals bar by bar, every column at once.
+
+    `buy` and `sell` are (time x column) arrays for k parameter sets side by
+    side, each k-th slice covering all panel symbols; `take_profit_pct` and
+    `stop_loss_pct` hold one value per column. One position per column: entered
+    at the signal bar's close, left when a later bar reaches the stop loss
+    (checked first when both levels are inside one bar), the take profit or a
+    sell signal, or at the last bar.
+    """
+    rows, columns = buy.shape
+    groups = columns // len(panel['symbols'])
+
+    def tiled(name, t):
+        return np.tile(panel[name][t], groups)
+
+    in_position = np.zeros(columns, dtype=bool)
+    entry = np.full(columns, np.nan)
+    take_profit = np.full(columns, np.nan)
+    stop_loss = np.full(columns, np.nan)
+    stats = {name: np.zeros(columns) for name in ['trades', 'wins', 'return_sum', 'gross_profit', 'gross_loss', 'max_drawdown']}
+    equity = np.ones(columns)
+    peak = np.ones(columns)
+    portfolio = np.empty((rows, groups))
+
+    def close_positions(closed, price):
+        returns = price[closed] * (1 - slippage) * (1 - fee) / (entry[closed] * (1 + fee)) - 1
+        stats['trades'][closed] += 1
+        stats['wins'][closed] += returns > 0
+        stats['return_sum'][closed] += returns
+        stats['gross_profit'][closed] += np.maximum(returns, 0)
+        stats['gross_loss'][closed] += np.maximum(-returns, 0)
+        equity[closed] *= 1 + returns
+        np.maximum(peak, equity, out=peak)
+        np.maximum(stats['max_drawdown'], 1 - equity / peak, out=stats['max_drawdown'])
+        in_position[closed] = False
+
+    for t in range(rows):
+        close = tiled('close', t)
+        if in_position.any():
+            open_, high, low = tiled('open', t), tiled('high', t), tiled('low', t)
+            stopped = in_position & (low <= stop_loss)
+            took = in_position & ~stopped & (high >= take_profit)
+            sold = in_position & ~stopped & ~took & sell[t]
+            # A gap through a level fills at the open
+            price = np.where(stopped, np.fmin(stop_loss, open_), np.where(took, np.fmax(take_profit, open_), close))
+            close_positions(stopped | took | sold, price)
+        entering = ~in_position & buy[t]
+        if entering.any():
+            entry[entering] = close[entering] * (1 + slippage)
+            _, take_profit[entering], stop_loss[entering] = trade_levels(
+                close[entering], take_profit_pct=take_profit_pct[entering], stop_loss_pct=stop_loss_pct[entering])
+            in_position |= entering
+        portfolio[t] = equity.reshape(groups, -1).mean(axis=1)
+
+    stats['open_at_end'] = in_position.astype(float)
+    close_positions(in_position.copy(), tiled('close', rows - 1))
+    stats['total_return'] = equity - 1
+    return stats, portfolio
+
+
+def _summary(stats):
+    trades = stats['trades']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'trades': trades,
+            'win_rate': stats['wins'] / trades,
+            'avg_trade_return': stats['return_sum'] / trades,
+            'total_return': stats['total_return'],
+            'max_drawdown': stats['max_drawdown'],
+            'profit_factor': stats['gross_profit'] / stats['gross_loss'],
+            'open_at_end': stats['open_at_end'],
+        }
+
+
+def _portfolio_stats(stats, curve):
+    # Equal capital per symbol, each compounding its own trades
+    totals = {name: values.sum() for name, values in stats.items()}
+    peak = np.maximum.accumulate(curve)
+    summary = _summary(totals)
+    summary['total_return'] = curve[-1] - 1
+    summary['max_drawdown'] = (1 - curve / peak).max()
+    return {name: float(value) for name, value in summary.items()}
+
+
+def run_params(panel, param_sets, fee=BACKTEST_FEE, slippage=BACKTEST_SLIPPAGE):
+    """Simulate several parameter sets in one pass; returns [(per_symbol, portfolio)] per set."""
+    symbol_count = len(panel['symbols'])
+    smas = {}
+    buys, sells = [], []
+    for params in param_sets:
+        window = params['sma_window']
+        if window not in smas:
+            smas[window] = panel['SMA_50'] if window == SMA_WINDOW else _rolling(panel['close'], window, np.mean)
+        buy, sell = signal_arrays(panel, window, params['rsi_threshold'], params['min_expected_increase'],
+                                  sma=smas[window])
+        buys.append(buy)
+        sells.append(sell)
+    take_profit = np.repeat([p['take_profit_pct'] for p in param_sets], symbol_count)
+    stop_loss = np.repeat([p['stop_loss_pct'] for p in param_sets], symbol_count)
+    stats, portfolio = simulate(panel, np.hstack(buys), np.hstack(sells), take_profit, stop_loss, fee, slippage)
+
+    outcomes = []
+    for g in range(len(param_sets)):
+        part = {name: values[g * symbol_count:(g + 1) * symbol_count] for name, values in stats.items()}
+        per_symbol = pd.DataFrame(_summary(part), index=pd.Index(panel['symbols'], name='symbol'))[STAT_COLUMNS]
+        outcomes.append((per_symbol, _portfolio_stats(part, portfolio[:, g])))
+    return outcomes
+
+
+def backtest(panel, fee=BACKTEST_FEE, slippage=BACKTEST_SLIPPAGE, **params):
+    """Per-symbol DataFrame and portfolio dict for one parameter set (DEFAULT_PARAMS overridden by `params`)."""
+    return run_params(panel, [{**DEFAULT_PARAMS, **params}], fee, slippage)[0]
+
+
+_worker_panel = None
+
+
+def _init_worker(panel):
+    global _worker_panel
+    _worker_panel = panel
+
+
+def _run_chunk(param_sets, fee, slippage):
+    return [portfolio for _, portfolio in run_params(_worker_panel, param_sets, fee, slippage)]
+
+
+def parameter_grid(**values):
+    """Every combination of the given value lists, on top of DEFAULT_PARAMS."""
+    names = list(values)
+    return [{**DEFAULT_PARAMS, **dict(zip(names, combo))} for combo in itertools.product(*values.values())]
+
+
+def sweep(panel, grid, fee=BACKTEST_FEE, slippage=BACKTEST_SLIPPAGE, workers=None, chunk_size=SWEEP_CHUNK_SIZE):
+    """Portfolio statistics for every parameter set in `grid`, best total return first.
+
+    The panel is sent to each worker once; tasks carry only parameter sets.
+    Sets sharing an SMA window go together so the SMA is computed once per chunk.
+    """
+    grid = sorted(grid, key=lambda p: p['sma_window'])
+    chunks = [grid[i:i + chunk_size] for i in range(0, len(grid), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(min(workers, len(chunks)) or 1, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(panel,)) as pool:
+        outcomes = pool.map(_run_chunk, chunks, [fee] * len(chunks), [slippage] * len(chunks))
+        rows = [{**params, **portfolio} for chunk, portfolios in zip(chunks, outcomes)
+                for params, portfolio in zip(chunk, portfolios)]
+    return pd.DataFrame(rows).sort_values('total_return', ascending=False, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest the scanner signals over stored candles')
+    parser.add_argument('--exchange', default='binanceus')
+    parser.add_argument('--interval', default='4h')
+    parser.add_argument('--symbols', nargs='+', help='defaults to every symbol in the candle store')
+    parser.add_argument('--synthetic', type=int, metavar='N', help='use N synthetic symbols instead of the store')
+    parser.add_argument('--candles', type=int, default=2000, help='candles per synthetic symbol')
+    parser.add_argument('--fee', type=float, default=BACKTEST_FEE)
+    parser.add_argument('--slippage', type=float, default=BACKTEST_SLIPPAGE)
+    parser.add_argument('--sma', type=int, nargs='+', default=[DEFAULT_PARAMS['sma_window']])
+    parser.add_argument('--rsi', type=float, nargs='+', default=[DEFAULT_PARAMS['rsi_threshold']])
+    parser.add_argument('--min-increase', type=float, nargs='+', default=[DEFAULT_PARAMS['min_expected_increase']])
+    parser.add_argument('--tp', type=float, nargs='+', default=[DEFAULT_PARAMS['take_profit_pct']])
+    parser.add_argument('--sl', type=float, nargs='+', default=[DEFAULT_PARAMS['stop_loss_pct']])
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--output', help='write the per-symbol table (single set) or the sweep table as CSV')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.synthetic:
+        from fake_exchange import synthetic_ohlcv
+        frames = {f'SYM{i}/USDT': klines_to_frame(synthetic_ohlcv(f'SYM{i}/USDT', args.candles, args.interval))
+                  for i in range(args.synthetic)}
+        panel = batch_indicators(stack_ohlcv(frames))
+    else:
+        symbols = args.symbols or stored_symbols(args.exchange, args.interval)
+        panel = load_panel(args.exchange, symbols, args.interval)
+    print(f"{len(panel['symbols'])} symbols x {panel['close'].shape[0]} candles loaded in {time.perf_counter() - started:.2f}s")
+
+    grid = parameter_grid(sma_window=args.sma, rsi_threshold=args.rsi, min_expected_increase=args.min_increase,
+                          take_profit_pct=args.tp, stop_loss_pct=args.sl)
+    started = time.perf_counter()
+    if len(grid) == 1:
+        table, portfolio = backtest(panel, args.fee, args.slippage, **grid[0])
+        table = table.sort_values('total_return', ascending=False)
+        print(table[table['trades'] > 0].to_string())
+        print(portfolio)
+    else:
+        table = sweep(panel, grid, args.fee, args.slippage, args.workers)
+        print(table.to_string())
+    print(f'{len(grid)} parameter sets in {time.perf_counter() - started:.2f}s')
+    if args.output:
+        table.to_csv(args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from fake_exchange import FakeAsyncExchange
+from async_fetch import stream_ohlcv
+from analysis import (
+    ANALYSIS_BLOCK_SYMBOLS, parse_klines, analyze_frames, calculate_expected_price, calculate_trade_levels,
+)
+from indicators import calculate_indicators, calculate_support_resistance, generate_signals
+from forecast import forecast_next_price_ols
+from charts import CHART_COLUMNS, plot_to_png
+
+SYMBOL_COUNTS = [10, 500, 2000]
+CANDLE_COUNTS = [306, 1000]
+RENDER_TOP = 10
+# Random walks rarely clear the scan's threshold, so by default every buy signal counts
+BENCHMARK_MIN_INCREASE = -np.inf
+
+
+class StageRecorder:
+    """Wall time, CPU time, traced peak memory and memory still held after each stage.
+
+    A stage entered again, e.g. once per block, adds up its times and keeps
+    the highest peak.
+    """
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        if self.memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            entry = {
+                'wall_seconds': time.perf_counter() - wall,
+                'cpu_seconds': time.process_time() - cpu,
+            }
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                entry['peak_bytes'] = peak - before
+                entry['retained_bytes'] = current - before
+            previous = self.stages.get(name)
+            if previous is not None:
+                entry['wall_seconds'] += previous['wall_seconds']
+                entry['cpu_seconds'] += previous['cpu_seconds']
+                if self.memory:
+                    entry['peak_bytes'] = max(entry['peak_bytes'], previous['peak_bytes'])
+                    entry['retained_bytes'] += previous['retained_bytes']
+            self.stages[name] = entry
+
+
+async def fetch_all(exchange, symbols, concurrency):
+    klines = {}
+    async for symbol, rows, error in stream_ohlcv(exchange, symbols, '4h', 0, concurrency=concurrency):
+        if error is None:
+            klines[symbol] = rows
+    return klines
+
+
+def run_case(symbol_count, candles, latency, concurrency, path, render_top, memory, seed=0, dtype='float64',
+             block_size=ANALYSIS_BLOCK_SYMBOLS, min_expected_increase=BENCHMARK_MIN_INCREASE):
+    symbols = [f'SYM{i}/USDT' for i in range(symbol_count)]
+    exchange = FakeAsyncExchange(symbols, candles=candles, latency=latency, jitter=latency / 2,
+                                 rate_limit=1, seed=seed)
+    recorder = StageRecorder(memory)
+
+    with recorder.stage('fetch'):
+        klines = asyncio.run(fetch_all(exchange, symbols, concurrency))
+    frames, _ = parse_klines(klines, recorder)
+    del klines
+
+    if path == 'batch':
+        # The scan's own stages, timed by the recorder: indicators, pricing, forecast, results
+        block_size = block_size or max(len(frames), 1)
+        results, _ = analyze_frames(frames, recorder, block_size, min_expected_increase, np.dtype(dtype))
+        selected = [r.coin_name for r in results]
+        ranked = sorted(results, key=lambda r: r.expected_increase_percentage, reverse=True)
+        to_render = [(r.coin_name, r.chart) for r in ranked[:render_top]]
+    else:
+        with recorder.stage('indicators'):
+            for symbol, df in frames.items():
+                generate_signals(calculate_support_resistance(calculate_indicators(df)))
+        with recorder.stage('pricing'):
+            selected = []
+            for symbol, df in frames.items():
+                _, increase = calculate_expected_price(df)
+                calculate_trade_levels(df)
+                if df['Buy_Signal'].iloc[-1] and increase >= min_expected_increase:
+                    selected.append(symbol)
+        with recorder.stage('forecast'):
+            for symbol, df in frames.items():
+                forecast_next_price_ols(df)
+        ranked = sorted(frames.items(), key=lambda item: -np.nan_to_num(calculate_expected_price(item[1])[1], nan=-np.inf))
+        with recorder.stage('results'):
+            records = [(symbol, df[CHART_COLUMNS]) for symbol, df in ranked[:render_top]]
+        to_render = records
+
+    with recorder.stage('render'):
+        for symbol, df in to_render:
+            plot_to_png(df, symbol, raw=True)
+
+    return {
+        'symbols': symbol_count,
+        'candles': candles,
+        'latency': latency,
+        'path': path,
+        'dtype': dtype if path == 'batch' else 'float64',
+        'block_size': block_size if path == 'batch' else None,
+        'min_expected_increase': min_expected_increase,
+        'selected': len(selected),
+        'rendered': len(to_render),
+        'stages': recorder.stages,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    def key(case):
+        return case['symbols'], case['candles'], case['latency'], case['path'], case.get('dtype', 'float64')
+
+    previous = {key(c): c for c in baseline['cases']}
+    for case in current['cases']:
+        old = previous.get(key(case))
+        if old is None:
+            continue
+        print(f"{case['path']} {case['symbols']} symbols x {case['candles']} candles vs {baseline.get('revision')}")
+        for stage, entry in case['stages'].items():
+            before = old['stages'].get(stage, {})
+            line = f"  {stage:10}"
+            if before.get('wall_seconds'):
+                line += f" {before['wall_seconds']:8.3f}s -> {entry['wall_seconds']:8.3f}s ({entry['wall_seconds'] / before['wall_seconds']:5.2f}x)"
+            if before.get('peak_bytes') and 'peak_bytes' in entry:
+                line += f"  peak {before['peak_bytes'] / 2**20:7.1f} -> {entry['peak_bytes'] / 2**20:7.1f} MiB"
+            if before:
+                print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scan pipeline on synthetic OHLCV data')
+    parser.add_argument('--symbols', type=int, nargs='+', default=SYMBOL_COUNTS)
+    parser.add_argument('--candles', type=int, nargs='+', default=CANDLE_COUNTS)
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated seconds per fetch_ohlcv call')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--path', choices=['batch', 'reference'], nargs='+', default=['batch'],
+                        help='batch engine, or the per-symbol reference path')
+    parser.add_argument('--render-top', type=int, default=RENDER_TOP, help='results built and charts rendered per case')
+    parser.add_argument('--dtype', choices=['float64', 'float32'], default='float64',
+                        help='panel dtype for the batch path')
+    parser.add_argument('--block-size', type=int, default=ANALYSIS_BLOCK_SYMBOLS,
+                        help='symbols per panel in the batch path, 0 for a single panel')
+    parser.add_argument('--min-increase', type=float, default=BENCHMARK_MIN_INCREASE,
+                        help='expected increase, percent, a buy signal needs to count as a result')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc, which slows every stage')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', help='earlier output file to compare wall times against')
+    args = parser.parse_args()
+
+    if 'reference' in args.path:
+        # Import once up front so the first case is not charged for it
+        import statsmodels.api  # noqa: F401
+    if not args.no_memory:
+        tracemalloc.start()
+    report = {
+        'revision': git_revision(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cases': [],
+    }
+    for path in args.path:
+        for candles in args.candles:
+            for symbol_count in args.symbols:
+                case = run_case(symbol_count, candles, args.latency, args.concurrency, path,
+                                args.render_top, not args.no_memory, args.seed, args.dtype, args.block_size,
+                                args.min_increase)
+                report['cases'].append(case)
+                stages = '  '.join(f"{name} {entry['wall_seconds']:.3f}s" + (f" {entry['peak_bytes'] / 2**20:.0f}MiB" if 'peak_bytes' in entry else '')
+                                   for name, entry in case['stages'].items())
+                print(f'{path} {symbol_count} symbols x {candles} candles: {stages}', flush=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+import asyncio
+import os
+import threading
+import weakref
+import numpy as np
+
+CANDLE_STORE_DIR = 'candle_cache'
+FETCH_LIMIT = 1000
+
+# One fixed-width record per candle, same column order as ccxt's fetch_ohlcv rows
+CANDLE_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+])
+
+
+class CandleStore:
+    """Append-only candle files, one per (exchange, symbol, interval).
+
+    Each file is a flat array of CANDLE_DTYPE records sorted by timestamp, so
+    reads are one sequential read and writes only touch the tail of the file.
+    Files are read rather than memory-mapped: another process truncating the
+    tail under a live map would crash the reader with SIGBUS.
+    """
+
+    def __init__(self, root=CANDLE_STORE_DIR):
+        self.root = root
+        self._locks = {}
+        self._async_locks = weakref.WeakKeyDictionary()
+        self._locks_guard = threading.Lock()
+
+    def path(self, exchange_id, symbol, interval):
+        name = symbol.replace('/', '_').replace(':', '_') + '.bin'
+        return os.path.join(self.root, exchange_id, interval, name)
+
+    def lock(self, exchange_id, symbol, interval):
+        # Reentrant, so load can run inside merge_fetched's hold
+        key = (exchange_id, symbol, interval)
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.RLock()
+            return self._locks[key]
+
+    def async_lock(self, exchange_id, symbol, interval):
+        """Per-key asyncio.Lock of the running loop, held across a fetch without blocking the loop."""
+        loop = asyncio.get_running_loop()
+        with self._locks_guard:
+            locks = self._async_locks.setdefault(loop, {})
+            key = (exchange_id, symbol, interval)
+            if key not in locks:
+                locks[key] = asyncio.Lock()
+            return locks[key]
+
+    def load(self, exchange_id, symbol, interval, since=None):
+        path = self.path(exchange_id, symbol, interval)
+        try:
+            with self.lock(exchange_id, symbol, interval), open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        # A partial record from an interrupted write is ignored
+        candles = np.frombuffer(data, dtype=CANDLE_DTYPE, count=len(data) // CANDLE_DTYPE.itemsize)
+        if since is not None:
+            candles = candles[np.searchsorted(candles['timestamp'], since):]
+        return candles.copy()
+
+    def last_timestamp(self, exchange_id, symbol, interval):
+        path = self.path(exchange_id, symbol, interval)
+        if not os.path.exists(path):
+            return None
+        count = os.path.getsize(path) // CANDLE_DTYPE.itemsize
+        if count == 0:
+            return None
+        with open(path, 'rb') as f:
+            f.seek((count - 1) * CANDLE_DTYPE.itemsize)
+            return int(np.frombuffer(f.read(CANDLE_DTYPE.itemsize), dtype=CANDLE_DTYPE)['timestamp'][0])
+
+    def fetched_from(self, exchange_id, symbol, interval):
+        """The earliest `since` the stored history was fetched from, or its first candle for older files."""
+        path = self.path(exchange_id, symbol, interval)
+        try:
+            with open(path + '.from') as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            pass
+        if not os.path.exists(path) or os.path.getsize(path) < CANDLE_DTYPE.itemsize:
+            return None
+        with open(path, 'rb') as f:
+            return int(np.frombuffer(f.read(CANDLE_DTYPE.itemsize), dtype=CANDLE_DTYPE)['timestamp'][0])
+
+    def set_fetched_from(self, exchange_id, symbol, interval, since):
+        # Kept beside the candles, so a symbol listed after `since` is not fetched whole again every run
+        path = self.path(exchange_id, symbol, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.from', 'w') as f:
+            f.write(str(int(since)))
+
+    def write(self, exchange_id, symbol, interval, candles):
+        """Merge sorted candles into the file.
+
+        Stored records at or after the first new timestamp are dropped before
+        appending, which replaces the previously still-open candle.
+        """
+        if len(candles) == 0:
+            return
+        path = self.path(exchange_id, symbol, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'ab+') as f:
+            size = f.seek(0, os.SEEK_END)
+            # A partial record from an interrupted write is discarded
+            count = size // CANDLE_DTYPE.itemsize
+            keep = count
+            if count:
+                f.seek(0)
+                stored = np.frombuffer(f.read(count * CANDLE_DTYPE.itemsize), dtype=CANDLE_DTYPE)
+                keep = int(np.searchsorted(stored['timestamp'], candles['timestamp'][0]))
+            f.truncate(keep * CANDLE_DTYPE.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(candles, dtype=CANDLE_DTYPE).tobytes())
+
+
+def klines_to_candles(klines):
+    candles = np.empty(len(klines), dtype=CANDLE_DTYPE)
+    if len(klines):
+        rows = np.array(klines, dtype=float)
+        candles['timestamp'] = rows[:, 0].astype(np.int64)
+        for i, name in enumerate(CANDLE_DTYPE.names[1:], start=1):
+            candles[name] = rows[:, i]
+    # Pages can overlap; keep the newest copy of each candle
+    _, last = np.unique(candles['timestamp'][::-1], return_index=True)
+    return candles[::-1][last]
+
+
+def resume_cursor(store, exchange_id, symbol, interval, since):
+    """Return the last stored timestamp and the `since` to fetch from.
+
+    When the window starts before the stored history, everything from
+    `since` is fetched again and `last` is None; writing it replaces the file.
+    """
+    with store.lock(exchange_id, symbol, interval):
+        last = store.last_timestamp(exchange_id, symbol, interval)
+        if last is None or last < since:
+            return last, since
+        if store.fetched_from(exchange_id, symbol, interval) > since:
+            return None, since
+    # The last stored candle may still have been open, so it is fetched again
+    return last, last
+
+
+def merge_fetched(store, exchange_id, symbol, interval, since, last, klines, limit=FETCH_LIMIT):
+    """Write freshly fetched klines and return the stored candles from `since` on, the last `limit` if set."""
+    with store.lock(exchange_id, symbol, interval):
+        if last is not None and last < since and os.path.exists(store.path(exchange_id, symbol, interval)):
+            # Stored history ends before the window; start the file over
+            os.remove(store.path(exchange_id, symbol, interval))
+        store.write(exchange_id, symbol, interval, klines_to_candles(klines))
+        if klines and (last is None or last < since):
+            store.set_fetched_from(exchange_id, symbol, interval, since)
+        candles = store.load(exchange_id, symbol, interval, since=since)
+    return candles[-limit:] if limit else candles
+
@@ -0,0 +1,103 @@
+import io
+import base64
+import threading
+from collections import OrderedDict
+
+from texts import TEXTS
+from timings import StageTimings
+
+# Upper bound on rendered PNG bytes kept in memory across sessions
+CHART_CACHE_BYTES = 64 * 1024 * 1024
+# Series a result keeps so its chart can be drawn later
+CHART_COLUMNS = ['close', 'SMA_50', 'EMA_50', 'BB_Upper', 'BB_Lower', 'ATR', 'Support', 'Resistance']
+# They are only drawn, so half precision of the analysis is plenty
+CHART_DTYPE = 'float32'
+
+def plot_to_png(df, symbol, language='en', raw=False):
+    # Imported here so scans and analysis workers never pay for matplotlib
+    from matplotlib.figure import Figure
+
+    # Figure without pyplot keeps no global state, so sessions can render concurrently
+    fig = Figure(figsize=(14, 7))
+    ax = fig.subplots()
+    ax.plot(df.index, df['close'], label=f'{TEXTS[language]["current_price"]}', color='blue')
+    ax.plot(df.index, df['SMA_50'], label=f'{TEXTS[language]["sma_50"]}', color='green')
+    ax.plot(df.index, df['EMA_50'], label='50-Day EMA / 50 Günlük EMA', color='red')
+    ax.plot(df.index, df['BB_Upper'], label='BB Upper Band / BB Üst Bandı', color='purple', linestyle='--')
+    ax.plot(df.index, df['BB_Lower'], label='BB Lower Band / BB Alt Bandı', color='purple', linestyle='--')
+    ax.plot(df.index, df['ATR'], label='ATR / ATR', color='orange')
+    
+    if 'Support' in df.columns:
+        ax.plot(df.index, df['Support'], label='Support / Destek', color='cyan', linestyle='--')
+    if 'Resistance' in df.columns:
+        ax.plot(df.index, df['Resistance'], label='Resistance / Direnç', color='magenta', linestyle='--')
+    
+    ax.set_title(f'{symbol} Analysis / {symbol} Analizi')
+    ax.set_xlabel('Date / Tarih')
+    ax.set_ylabel('Price / Fiyat')
+    ax.legend()
+
+    # Ensure scientific notation is applied
+    ax.ticklabel_format(axis='y', style='scientific', scilimits=(0,0))
+
+    img = io.BytesIO()
+    fig.savefig(img, format='png')
+    if raw:
+        return img.getvalue()
+
+    img_base64 = base64.b64encode(img.getvalue()).decode('utf-8')
+    return img_base64
+
+class ChartCache:
+    """LRU of rendered PNG bytes, bounded by total size rather than entry count."""
+
+    def __init__(self, max_bytes=CHART_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            png = self._entries.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return png
+
+    def put(self, key, png):
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            if len(png) > self.max_bytes:
+                return
+            self._entries[key] = png
+            self.size += len(png)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+chart_cache = ChartCache()
+# PNG render times of this process, across sessions
+render_timings = StageTimings()
+
+def render_chart(df, symbol, interval, language='en', raw=False, cache=None, exchange=None):
+    """Render a chart at most once per (exchange, symbol, interval, last candle, language).
+
+    Returns PNG bytes when `raw`, otherwise the base64 text used in data URIs.
+    """
+    cache = chart_cache if cache is None else cache
+    key = (exchange, symbol, interval, df.index[-1], language)
+    png = cache.get(key)
+    if png is None:
+        with render_timings.stage('render'):
+            png = plot_to_png(df, symbol, language, raw=True)
+        render_timings.incr('png_bytes', len(png))
+        cache.put(key, png)
+    if raw:
+        return png
+    return base64.b64encode(png).decode('utf-8')
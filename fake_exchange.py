@@ -0,0 +1,60 @@
+import asyncio
+import random
+import zlib
+import numpy as np
+import ccxt
+
+# Offline stand-ins for ccxt exchanges, used for benchmarks and local runs
+
+INTERVAL_MS = {
+    '1m': 60_000,
+    '5m': 300_000,
+    '15m': 900_000,
+    '1h': 3_600_000,
+    '4h': 14_400_000,
+    '1d': 86_400_000,
+    '1w': 604_800_000,
+}
+
+
+def synthetic_ohlcv(symbol, candles, interval='4h', end=None, seed=0):
+    """Reproducible random-walk klines in ccxt's [timestamp, o, h, l, c, v] layout."""
+    step = INTERVAL_MS[interval]
+    end = end if end is not None else 1_700_000_000_000 // step * step
+    # crc32 rather than a character sum, which gives SYM12 and SYM21 the same series
+    rng = np.random.default_rng([seed, zlib.crc32(symbol.encode())])
+    close = np.exp(np.cumsum(rng.normal(0, 0.02, candles))) * rng.uniform(1e-4, 1e3)
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, candles))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, candles))
+    volume = rng.uniform(1e2, 1e6, candles)
+    timestamps = end - step * np.arange(candles)[::-1]
+    return [[int(t), o, h, l, c, v] for t, o, h, l, c, v in zip(timestamps, open_, high, low, close, volume)]
+
+
+class FakeAsyncExchange:
+    """Minimal async ccxt look-alike serving synthetic klines after a simulated delay."""
+
+    def __init__(self, symbols, candles=300, interval='4h', latency=0.05, jitter=0.02,
+                 error_rate=0.0, rate_limit=50, exchange_id='fake', seed=0):
+        self.id = exchange_id
+        self.rateLimit = rate_limit
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._klines = {s: synthetic_ohlcv(s, candles, interval, seed=seed) for s in symbols}
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        self.requests += 1
+        await asyncio.sleep(max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter)))
+        if self._random.random() < self.error_rate:
+            raise ccxt.RequestTimeout(f'{self.id} fake timeout ({symbol})')
+        klines = self._klines[symbol]
+        if since is not None:
+            klines = [k for k in klines if k[0] >= since]
+        return klines[:limit] if limit else klines
+
+    async def close(self):
+        pass
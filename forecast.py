@@ -0,0 +1,207 @@
+import math
+from collections import deque
+import numpy as np
+
+# The original OLS forecast predicted at x = len(df) + 1 (one step past the
+# next candle); every model here keeps that convention so results line up.
+FORECAST_STEPS_AHEAD = 2
+
+
+class LinearTrend:
+    """Least-squares line through (0, y0), (1, y1), ... kept as running sums.
+
+    update() adds one point in O(1), so a fitted trend follows new candles
+    without refitting the whole history.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_xx = 0.0
+        self.sum_xy = 0.0
+
+    @classmethod
+    def fit(cls, values, **kwargs):
+        return cls(**kwargs).extend(values)
+
+    def extend(self, values):
+        y = np.asarray(values, dtype=float)
+        x = self.n + np.arange(len(y), dtype=float)
+        self.n += len(y)
+        self.sum_x += x.sum()
+        self.sum_y += y.sum()
+        self.sum_xx += (x * x).sum()
+        self.sum_xy += (x * y).sum()
+        return self
+
+    def _add(self, x, y, weight=1.0):
+        self.n += weight
+        self.sum_x += weight * x
+        self.sum_y += weight * y
+        self.sum_xx += weight * x * x
+        self.sum_xy += weight * x * y
+
+    def update(self, value):
+        self._add(self.next_x(), float(value))
+        return self
+
+    def next_x(self):
+        return self.n
+
+    def coefficients(self):
+        """Return (intercept, slope)."""
+        denominator = self.n * self.sum_xx - self.sum_x ** 2
+        if self.n == 0:
+            return math.nan, math.nan
+        if denominator == 0:
+            return self.sum_y / self.n, 0.0
+        slope = (self.n * self.sum_xy - self.sum_x * self.sum_y) / denominator
+        intercept = (self.sum_y - slope * self.sum_x) / self.n
+        return intercept, slope
+
+    def predict(self, x):
+        intercept, slope = self.coefficients()
+        return intercept + slope * x
+
+    def forecast_next(self):
+        return self.predict(self.next_x() - 1 + FORECAST_STEPS_AHEAD)
+
+
+class RollingTrend(LinearTrend):
+    """Linear trend over the last `window` points only."""
+
+    def __init__(self, window=50):
+        super().__init__()
+        self.window = window
+        self.count = 0
+        self.points = deque()
+
+    def next_x(self):
+        return self.count
+
+    def extend(self, values):
+        for value in values:
+            self.update(value)
+        return self
+
+    def update(self, value):
+        x, y = self.count, float(value)
+        self._add(x, y)
+        self.points.append((x, y))
+        self.count += 1
+        if len(self.points) > self.window:
+            old_x, old_y = self.points.popleft()
+            self._add(old_x, old_y, weight=-1.0)
+        return self
+
+
+class WeightedTrend(LinearTrend):
+    """Exponentially weighted linear trend; a point's weight halves every `halflife` updates."""
+
+    def __init__(self, halflife=50):
+        super().__init__()
+        self.decay = 0.5 ** (1.0 / halflife)
+        self.count = 0
+
+    def next_x(self):
+        return self.count
+
+    def extend(self, values):
+        for value in values:
+            self.update(value)
+        return self
+
+    def update(self, value):
+        self.n *= self.decay
+        self.sum_x *= self.decay
+        self.sum_y *= self.decay
+        self.sum_xx *= self.decay
+        self.sum_xy *= self.decay
+        self._add(self.count, float(value))
+        self.count += 1
+        return self
+
+
+def forecast_next_price(df):
+    return LinearTrend.fit(df['close'].to_numpy(dtype=float)).forecast_next()
+
+
+def forecast_next_batch(close, start):
+    """Trend forecast for every column of a (time x symbol) panel at once.
+
+    `start` is each column's first valid row, as produced by indicators.stack_ohlcv.
+    """
+    rows = close.shape[0]
+    n = (rows - start).astype(float)
+    x = np.arange(rows, dtype=float)[:, None] - start[None, :]
+    valid = x >= 0
+    x_mean = (n - 1) / 2
+    y_mean = np.where(valid, close, 0.0).sum(axis=0) / n
+    dx = np.where(valid, x - x_mean, 0.0)
+    dy = np.where(valid, close - y_mean, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (dx * dy).sum(axis=0) / (dx * dx).sum(axis=0)
+    slope = np.where(n > 1, slope, 0.0)
+    intercept = y_mean - slope * x_mean
+    return intercept + slope * (n - 1 + FORECAST_STEPS_AHEAD)
+
+
+def forecast_next_price_ols(df):
+    # Reference implementation with statsmodels, kept for checking the models above
+    import pandas as pd
+    import statsmodels.api as sm
+
+    df = df.copy()
+    df['day'] = np.arange(len(df))
+    X = df[['day']]
+    y = df['close']
+
+    model = sm.OLS(y, sm.add_constant(X)).fit()
+
+    next_day_index = np.array([[len(df) + 1]])
+    next_day_df = pd.DataFrame(next_day_index, columns=['day'])
+    next_day_df = sm.add_constant(next_day_df, has_constant='add')
+
+    forecast = model.predict(next_day_df)
+
+    return forecast[0]
+
+
+def _benchmark(symbols, candles):
+    import time
+    import pandas as pd
+    from fake_exchange import synthetic_ohlcv
+    from analysis import klines_to_frame
+    from indicators import stack_ohlcv
+
+    frames = {f'SYM{i}/USDT': klines_to_frame(synthetic_ohlcv(f'SYM{i}/USDT', candles)) for i in range(symbols)}
+
+    started = time.perf_counter()
+    reference = pd.Series({s: forecast_next_price_ols(df) for s, df in frames.items()})
+    ols_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    closed_form = pd.Series({s: forecast_next_price(df) for s, df in frames.items()})
+    closed_form_seconds = time.perf_counter() - started
+
+    panel = stack_ohlcv(frames)
+    started = time.perf_counter()
+    batch = pd.Series(forecast_next_batch(panel['close'], panel['start']), index=panel['symbols'])
+    batch_seconds = time.perf_counter() - started
+
+    for name, values, seconds in [('statsmodels OLS', reference, ols_seconds),
+                                  ('closed form', closed_form, closed_form_seconds),
+                                  ('batched', batch, batch_seconds)]:
+        error = (values / reference - 1).abs().max()
+        print(f'{name:16} {seconds * 1e6 / symbols:10.1f} us/symbol  max rel. diff {error:.1e}')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compare trend forecasts with the statsmodels reference')
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--candles', type=int, default=306)
+    args = parser.parse_args()
+    _benchmark(args.symbols, args.candles)
@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Constants for indicators
+SMA_WINDOW = 50
+BOLLINGER_WINDOW = 20
+RSI_TIME_PERIOD = 14
+MACD_FAST_PERIOD = 12
+MACD_SLOW_PERIOD = 26
+MACD_SIGNAL_PERIOD = 9
+ATR_PERIOD = 14
+STOCH_FASTK_PERIOD = 14
+STOCH_SLOWK_PERIOD = 3
+SUPPORT_RESISTANCE_WINDOW = 50
+
+# Columns per block in rolling windows; np.std over a window view makes a
+# (rows x block x window) temporary, so this bounds the peak memory
+ROLLING_BLOCK_COLUMNS = 256
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+INDICATOR_COLUMNS = [
+    'SMA_50', 'EMA_50', 'BB_Middle', 'BB_Upper', 'BB_Lower', 'RSI',
+    'MACD_Line', 'MACD_Signal', 'ATR', '%K', '%D', 'Support', 'Resistance',
+]
+SIGNAL_COLUMNS = ['Buy_Signal', 'Sell_Signal']
+
+
+# Per-symbol reference path. The batch engine below must agree with these.
+
+def calculate_indicators(df):
+    df['SMA_50'] = df['close'].rolling(window=SMA_WINDOW).mean()
+    df['EMA_50'] = df['close'].ewm(span=SMA_WINDOW, adjust=False).mean()
+
+    df['BB_Middle'] = df['close'].rolling(window=BOLLINGER_WINDOW).mean()
+    df['BB_Upper'] = df['BB_Middle'] + 2 * df['close'].rolling(window=BOLLINGER_WINDOW).std()
+    df['BB_Lower'] = df['BB_Middle'] - 2 * df['close'].rolling(window=BOLLINGER_WINDOW).std()
+
+    delta = df['close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=RSI_TIME_PERIOD).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=RSI_TIME_PERIOD).mean()
+    rs = gain / loss
+    df['RSI'] = 100 - (100 / (1 + rs))
+
+    df['MACD_Line'] = df['close'].ewm(span=MACD_FAST_PERIOD, adjust=False).mean() - df['close'].ewm(span=MACD_SLOW_PERIOD, adjust=False).mean()
+    df['MACD_Signal'] = df['MACD_Line'].ewm(span=MACD_SIGNAL_PERIOD, adjust=False).mean()
+
+    # Scratch series stay local instead of becoming columns of df
+    prev_close = df['close'].shift(1)
+    true_range = pd.concat([df['high'], prev_close], axis=1).max(axis=1) - pd.concat([df['low'], prev_close], axis=1).min(axis=1)
+    df['ATR'] = true_range.rolling(window=ATR_PERIOD).mean()
+
+    lowest_low = df['low'].rolling(window=STOCH_FASTK_PERIOD).min()
+    highest_high = df['high'].rolling(window=STOCH_FASTK_PERIOD).max()
+    df['%K'] = 100 * (df['close'] - lowest_low) / (highest_high - lowest_low)
+    df['%D'] = df['%K'].rolling(window=STOCH_SLOWK_PERIOD).mean()
+
+    return df
+
+def calculate_support_resistance(df):
+    df['Support'] = df['low'].rolling(window=SUPPORT_RESISTANCE_WINDOW).min()
+    df['Resistance'] = df['high'].rolling(window=SUPPORT_RESISTANCE_WINDOW).max()
+    return df
+
+def generate_signals(df):
+    df['Buy_Signal'] = (df['close'] > df['SMA_50']) & (df['MACD_Line'] > df['MACD_Signal']) & (df['%K'] > df['%D']) & (df['%K'] > 20)
+    df['Sell_Signal'] = (df['close'] < df['SMA_50']) & (df['RSI'] > 70)
+    return df
+
+
+# Batch engine: every symbol is one column of a (time x symbol) array.
+#
+# Series are aligned on their last candle and padded with NaN at the top, so
+# column j holds exactly the rows its per-symbol DataFrame would have. Rolling
+# windows that touch the padding come out NaN, which is the same result pandas
+# gives for the first window-1 rows of a short frame.
+
+def stack_ohlcv(frames, dtype=np.float64):
+    """Build a panel from a {symbol: OHLCV DataFrame} mapping.
+
+    Every array of the panel, indicators included, uses `dtype`. float32
+    halves the memory, but MACD (a difference of two EMAs) loses most of its
+    digits near zero, so scans keep the float64 default.
+    """
+    symbols = [s for s, df in frames.items() if not df.empty]
+    rows = max((len(frames[s]) for s in symbols), default=0)
+    panel = {
+        'symbols': symbols,
+        'index': [frames[s].index for s in symbols],
+        'start': np.array([rows - len(frames[s]) for s in symbols], dtype=np.int64),
+    }
+    for column in OHLCV_COLUMNS:
+        arr = np.full((rows, len(symbols)), np.nan, dtype=dtype)
+        for j, symbol in enumerate(symbols):
+            values = frames[symbol][column].to_numpy(dtype=dtype)
+            arr[rows - len(values):, j] = values
+        panel[column] = arr
+    return panel
+
+def _rolling(arr, window, func, out=None, **kwargs):
+    out = np.empty(arr.shape, dtype=arr.dtype) if out is None else out
+    out[:window - 1] = np.nan
+    if arr.shape[0] >= window:
+        for block in range(0, arr.shape[1], ROLLING_BLOCK_COLUMNS):
+            columns = slice(block, block + ROLLING_BLOCK_COLUMNS)
+            out[window - 1:, columns] = func(sliding_window_view(arr[:, columns], window, axis=0), axis=-1, **kwargs)
+    return out
+
+def _ewm(arr, span):
+    # adjust=False recurrence, seeded by each column's first value
+    alpha = 2.0 / (span + 1)
+    out = np.empty(arr.shape, dtype=arr.dtype)
+    prev = np.full(arr.shape[1], np.nan, dtype=arr.dtype)
+    for t in range(arr.shape[0]):
+        x = arr[t]
+        prev = np.where(np.isnan(prev), x, np.where(np.isnan(x), prev, alpha * x + (1 - alpha) * prev))
+        out[t] = prev
+    return out
+
+def batch_indicators(panel):
+    """Add indicator, support/resistance and signal arrays to a panel."""
+    close, high, low = panel['close'], panel['high'], panel['low']
+    valid = np.arange(close.shape[0])[:, None] >= panel['start'][None, :]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        panel['SMA_50'] = _rolling(close, SMA_WINDOW, np.mean)
+        panel['EMA_50'] = _ewm(close, SMA_WINDOW)
+
+        bb_std = _rolling(close, BOLLINGER_WINDOW, np.std, ddof=1)
+        panel['BB_Middle'] = _rolling(close, BOLLINGER_WINDOW, np.mean)
+        panel['BB_Upper'] = panel['BB_Middle'] + 2 * bb_std
+        panel['BB_Lower'] = panel['BB_Middle'] - 2 * bb_std
+
+        # Intermediates go through three scratch arrays reused below
+        scratch = [np.empty(close.shape, dtype=close.dtype) for _ in range(3)]
+
+        delta = scratch[0]
+        delta[0] = np.nan
+        np.subtract(close[1:], close[:-1], out=delta[1:])
+        # Series.where() turns the leading NaN diff into 0, padding stays NaN
+        gain = np.fmax(delta, 0, out=scratch[1])
+        gain[~valid] = np.nan
+        average_gain = _rolling(gain, RSI_TIME_PERIOD, np.mean, out=scratch[2])
+        np.negative(delta, out=delta)
+        loss = np.fmax(delta, 0, out=scratch[1])
+        loss[~valid] = np.nan
+        average_loss = _rolling(loss, RSI_TIME_PERIOD, np.mean, out=scratch[0])
+        rs = np.divide(average_gain, average_loss, out=scratch[2])
+        panel['RSI'] = 100 - (100 / (1 + rs))
+
+        panel['MACD_Line'] = _ewm(close, MACD_FAST_PERIOD) - _ewm(close, MACD_SLOW_PERIOD)
+        panel['MACD_Signal'] = _ewm(panel['MACD_Line'], MACD_SIGNAL_PERIOD)
+
+        prev_close = scratch[0]
+        prev_close[0] = np.nan
+        prev_close[1:] = close[:-1]
+        true_range = np.fmax(high, prev_close, out=scratch[1])
+        true_range -= np.fmin(low, prev_close, out=scratch[2])
+        panel['ATR'] = _rolling(true_range, ATR_PERIOD, np.mean)
+
+        lowest_low = _rolling(low, STOCH_FASTK_PERIOD, np.min, out=scratch[0])
+        highest_high = _rolling(high, STOCH_FASTK_PERIOD, np.max, out=scratch[1])
+        highest_high -= lowest_low
+        panel['%K'] = 100 * np.subtract(close, lowest_low, out=scratch[2]) / highest_high
+        panel['%D'] = _rolling(panel['%K'], STOCH_SLOWK_PERIOD, np.mean)
+
+        panel['Support'] = _rolling(low, SUPPORT_RESISTANCE_WINDOW, np.min)
+        panel['Resistance'] = _rolling(high, SUPPORT_RESISTANCE_WINDOW, np.max)
+
+        panel['Buy_Signal'] = (close > panel['SMA_50']) & (panel['MACD_Line'] > panel['MACD_Signal']) & (panel['%K'] > panel['%D']) & (panel['%K'] > 20)
+        panel['Sell_Signal'] = (close < panel['SMA_50']) & (panel['RSI'] > 70)
+    return panel
+
+def symbol_frame(panel, j):
+    """Per-symbol DataFrame view of panel column j, shaped like the reference path output."""
+    start = panel['start'][j]
+    columns = [c for c in OHLCV_COLUMNS + INDICATOR_COLUMNS + SIGNAL_COLUMNS if c in panel]
+    return pd.DataFrame({c: panel[c][start:, j] for c in columns}, index=panel['index'][j])
+
+def compare_with_reference(frames, rtol=1e-9, atol=1e-9):
+    """Run both paths over frames and return the symbols/columns where they disagree.
+
+    Signals are left out: they are strict comparisons of these columns, so a
+    %K/%D tie can flip on the last bit of rounding between the two paths.
+    """
+    panel = batch_indicators(stack_ohlcv(frames))
+    mismatches = []
+    for j, symbol in enumerate(panel['symbols']):
+        reference = generate_signals(calculate_support_resistance(calculate_indicators(frames[symbol].copy())))
+        batch = symbol_frame(panel, j)
+        for column in INDICATOR_COLUMNS:
+            expected = reference[column].to_numpy(dtype=float)
+            actual = batch[column].to_numpy(dtype=float)
+            if not np.allclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True):
+                mismatches.append((symbol, column))
+    return mismatches
+
+if __name__ == '__main__':
+    import argparse
+    from analysis import klines_to_frame
+    from fake_exchange import synthetic_ohlcv
+
+    parser = argparse.ArgumentParser(description='Check the batch indicator engine against the per-symbol pandas path')
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--candles', type=int, default=306)
+    parser.add_argument('--rtol', type=float, default=1e-9)
+    args = parser.parse_args()
+
+    # Uneven lengths, so the check covers series that start at different rows of the panel
+    frames = {f'SYM{i}/USDT': klines_to_frame(synthetic_ohlcv(f'SYM{i}/USDT', args.candles - i % 50))
+              for i in range(args.symbols)}
+    mismatches = compare_with_reference(frames, args.rtol)
+    print(f'{len(frames)} symbols, {len(mismatches)} columns disagree beyond rtol {args.rtol}: {mismatches[:10]}')
+    raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,146 @@
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from timings import LATENCY_BUCKETS
+
+# Symbols listed per group in an error summary
+ERROR_EXAMPLES = 3
+METRIC_PREFIX = 'scan'
+
+
+def error_kind(error):
+    # Fetch failures read "RequestTimeout: ...", so the exception class is the kind;
+    # otherwise the detail, e.g. the timeframe a symbol had too few candles on
+    head, sep, _ = error['message'].partition(':')
+    if sep and head.isidentifier():
+        return head
+    return error['message'] or error['key']
+
+
+def error_summary(errors, examples=ERROR_EXAMPLES):
+    """Report errors grouped by exchange, text key and kind, largest group first."""
+    groups = {}
+    for error in errors:
+        kind = error_kind(error)
+        group = groups.setdefault((error['exchange'], error['key'], kind), {
+            'exchange': error['exchange'], 'key': error['key'], 'kind': kind, 'count': 0, 'symbols': [],
+        })
+        group['count'] += 1
+        if len(group['symbols']) < examples:
+            group['symbols'].append(error['symbol'])
+    return sorted(groups.values(), key=lambda g: g['count'], reverse=True)
+
+
+def scan_metrics(scans):
+    """Stage histograms and counters per exchange of a multi_scan.scan_exchanges result."""
+    return {code: {'stages': s['timings'].as_dict(), 'counters': s['timings'].counters_dict()}
+            for code, s in scans.items()}
+
+
+def counter_rows(report):
+    return [{'exchange': code, **m['counters']} for code, m in report.get('metrics', {}).items()]
+
+
+def prometheus_text(report, prefix=METRIC_PREFIX):
+    """The report's metrics in the Prometheus text format, e.g. for node_exporter's textfile collector."""
+    families = {}
+
+    def sample(name, kind, labels, value, suffix=''):
+        lines = families.setdefault(name, [f'# TYPE {name} {kind}'])
+        label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+        lines.append(f'{name}{suffix}{{{label_text}}} {value}')
+
+    for code, m in report.get('metrics', {}).items():
+        for counter, value in sorted(m['counters'].items()):
+            sample(f'{prefix}_{counter}', 'gauge', {'exchange': code}, value)
+        for stage, entry in m['stages'].items():
+            labels = {'exchange': code, 'stage': stage}
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, entry['buckets']):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                sample(f'{prefix}_stage_seconds', 'histogram', {**labels, 'le': le}, cumulative, '_bucket')
+            sample(f'{prefix}_stage_seconds', 'histogram', labels, entry['seconds'], '_sum')
+            sample(f'{prefix}_stage_seconds', 'histogram', labels, entry['count'], '_count')
+    for group in report.get('error_summary', []):
+        sample(f'{prefix}_errors', 'gauge', {k: group[k] for k in ('exchange', 'key', 'kind')}, group['count'])
+    sample(f'{prefix}_duration_seconds', 'gauge', {'interval': report['interval']}, report['seconds'])
+    return '\n'.join(line for lines in families.values() for line in lines) + '\n'
+
+
+def write_metrics(report, path):
+    """Export a report's metrics: Prometheus text for a .prom path (replaced), else one JSON line appended."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if path.endswith('.prom'):
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(prometheus_text(report))
+        os.replace(tmp, path)
+        return
+    line = {
+        'created': report.get('created', datetime.now(timezone.utc).isoformat()),
+        'exchanges': report['exchanges'],
+        'interval': report['interval'],
+        'seconds': report['seconds'],
+        'cancelled': report.get('cancelled', False),
+        'metrics': report.get('metrics', {}),
+        'error_summary': report.get('error_summary', []),
+    }
+    with open(path, 'a') as f:
+        f.write(json.dumps(line) + '\n')
+
+
+@contextmanager
+def profiled(path=None):
+    """cProfile the calling thread, e.g. a scan's event loop, into `path`; does nothing without a path.
+
+    Analysis runs in worker processes and is not included; its stage
+    timings are.
+    """
+    if not path:
+        yield None
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        profile.dump_stats(path)
+
+
+def profile_summary(path, top=20, sort='cumulative'):
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats(sort).print_stats(top)
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show a scan profile or the slowest stages of a metrics file')
+    parser.add_argument('path', help='.prof written with --profile, or a .jsonl metrics file')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.path.endswith('.prof'):
+        print(profile_summary(args.path, args.top))
+        return
+    rows = []
+    with open(args.path) as f:
+        for line in f:
+            entry = json.loads(line)
+            for code, m in entry['metrics'].items():
+                for stage, s in m['stages'].items():
+                    rows.append((s['seconds'], entry['created'], code, stage, s['count']))
+    for seconds, created, code, stage, count in sorted(rows, reverse=True)[:args.top]:
+        print(f'{created}  {code:<12} {stage:<12} {seconds:>9.2f}s  {count:>6} calls')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+from async_fetch import FETCH_CONCURRENCY, create_async_exchange, fetch_with_retry
+from analysis import MIN_EXPECTED_INCREASE, TopResults, exact_prices
+from indicators import SMA_WINDOW
+from pipeline import run_pipeline
+from resources import get_exchange, load_markets, candle_memo, rate_limiters
+from timings import StageTimings
+from universe import screen_with_tickers
+
+# In-flight candle requests per scan of a venue; every scan of the venue shares its rateLimit token bucket
+EXCHANGE_CONCURRENCY = {
+    'binanceus': 16,
+    'gateio': 16,
+    'bitfinex': 4,
+    'huobi': 16,
+    'kraken': 4,
+}
+# A venue still running after this many seconds is cut off with what it has so far
+EXCHANGE_SCAN_TIMEOUT = 600
+
+
+async def price_exact(exchange, limiter, scan, interval):
+    # Exact mode: each result priced again from the exchange's latest close strings
+    async def reprice(result):
+        try:
+            klines = await fetch_with_retry(exchange, limiter, result.coin_name, interval, None, SMA_WINDOW,
+                                            timings=scan['timings'])
+        except Exception as e:
+            scan['errors'].append((result.coin_name, 'data_fetching_error', f'{type(e).__name__}: {e}'))
+            scan['failed'] += 1
+            return
+        result.exact = exact_prices(exchange, result.coin_name, [k[4] for k in klines])
+
+    with scan['timings'].stage('exact'):
+        await asyncio.gather(*(reprice(result) for result in scan['results']))
+
+
+async def scan_exchange(exchange_code, interval, since, store, scan, screen=None,
+                        min_expected_increase=MIN_EXPECTED_INCREASE, confluence=(), exact=False):
+    exchange = get_exchange(exchange_code)
+    with scan['timings'].stage('markets'):
+        markets = await asyncio.to_thread(load_markets, exchange)
+    with scan['timings'].stage('screen'):
+        symbols, dropped, tickers = await asyncio.to_thread(screen_with_tickers, exchange, markets=markets,
+                                                            **(screen or {}))
+    scan['pairs'] = len(symbols)
+    scan['dropped'] = dropped
+    scan['prices'] = {s: t.get('last') for s, t in tickers.items()}
+    async_exchange = create_async_exchange(exchange_code, markets)
+    limiter = rate_limiters.get(async_exchange)
+    try:
+        await run_pipeline(async_exchange, symbols, interval, since, store=store,
+                           fetch_concurrency=EXCHANGE_CONCURRENCY.get(exchange_code, FETCH_CONCURRENCY),
+                           limiter=limiter,
+                           timings=scan['timings'], results=scan['results'], errors=scan['errors'],
+                           memo=candle_memo, min_expected_increase=min_expected_increase, confluence=confluence,
+                           progress=scan)
+    finally:
+        await async_exchange.close()
+    if exact:
+        exact_exchange = create_async_exchange(exchange_code, markets, exact=True)
+        try:
+            await price_exact(exact_exchange, limiter, scan, interval)
+        finally:
+            await exact_exchange.close()
+
+
+async def scan_exchanges(exchange_codes, interval, since, store=None, timeout=EXCHANGE_SCAN_TIMEOUT, on_done=None,
+                         screen=None, min_expected_increase=MIN_EXPECTED_INCREASE, confluence=(), top_k=None,
+                         scans=None, exact=False):
+    """Scan several venues at once; each runs with its own limits and timeout.
+
+    `on_done(code, scan)` is called as each venue finishes, so a slow one
+    does not hold back the others. `screen` holds keyword arguments for
+    universe.screen_with_tickers. Returns {code: scan}, where a scan holds
+    that venue's results, errors, timings, prices, progress counts and
+    final status. With `top_k`, each venue keeps only its best results.
+    Pass in a `scans` dict to read progress while the scan runs, or to keep
+    what was finished if it is cancelled. With `exact`, each venue's results
+    also get exact-mode prices, see analysis.exact_prices.
+    """
+    scans = scans if scans is not None else {}
+    scans.update({
+        code: {'results': TopResults(top_k) if top_k else [], 'errors': [], 'timings': StageTimings(),
+               'prices': {}, 'pairs': 0, 'dropped': {}, 'status': 'running', 'done': 0, 'failed': 0}
+        for code in exchange_codes
+    })
+
+    async def run(code):
+        scan = scans[code]
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(scan_exchange(code, interval, since, store, scan, screen, min_expected_increase,
+                                                 confluence, exact), timeout)
+            scan['status'] = 'done'
+        except asyncio.TimeoutError:
+            scan['status'] = 'timeout'
+        except Exception as e:
+            scan['status'] = f'failed: {e}'
+        scan['seconds'] = time.perf_counter() - started
+        if on_done is not None:
+            on_done(code, scan)
+
+    await asyncio.gather(*[run(code) for code in exchange_codes])
+    return scans
+
+
+def merge_results(scans):
+    """One ranked row per symbol across venues.
+
+    The venue with the highest expected increase supplies the row; `venues`
+    maps every venue listing the symbol to its last price there.
+    """
+    by_symbol = {}
+    for code, scan in scans.items():
+        for result in scan['results']:
+            by_symbol.setdefault(result.coin_name, []).append(result)
+
+    merged = []
+    for symbol, results in by_symbol.items():
+        best = max(results, key=lambda r: r.expected_increase_percentage).copy()
+        venues = {code: scan['prices'][symbol] for code, scan in scans.items() if scan['prices'].get(symbol) is not None}
+        venues.update({r.exchange: r.price for r in results if r.exchange not in venues})
+        best.venues = venues
+        merged.append(best)
+    merged.sort(key=lambda r: r.expected_increase_percentage, reverse=True)
+    return merged
@@ -0,0 +1,119 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from async_fetch import FETCH_CONCURRENCY, stream_ohlcv
+from analysis import MIN_EXPECTED_INCREASE, analyze_batch
+from timeframes import base_timeframe, analyze_timeframes_batch
+from timings import StageTimings
+
+# Worker processes for parsing, indicators and forecasting
+ANALYSIS_WORKERS = os.cpu_count() or 1
+# Symbols sent to an analysis worker in one task
+ANALYSIS_BATCH_SIZE = 100
+# The first batch goes out early, so the first results show up within seconds
+FIRST_BATCH_SIZE = 10
+# Batches allowed to wait for a free worker before fetching is held back
+QUEUE_SIZE = 4
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_process_pool(workers=ANALYSIS_WORKERS):
+    # Pools outlive a single scan so worker start-up is paid once per process.
+    # Spawned workers do not inherit the parent's threads or open sessions.
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pools[workers]
+
+
+async def run_pipeline(exchange, symbols, interval, since, store=None,
+                       fetch_concurrency=FETCH_CONCURRENCY, analysis_workers=ANALYSIS_WORKERS,
+                       batch_size=ANALYSIS_BATCH_SIZE, queue_size=QUEUE_SIZE, timings=None,
+                       results=None, errors=None, memo=None, min_expected_increase=MIN_EXPECTED_INCREASE,
+                       confluence=(), progress=None, limiter=None):
+    """Fetch candles and analyze them in a process pool as they arrive.
+
+    The stages are joined by a bounded queue, so a slow analysis stage holds
+    back fetching instead of piling up candles in memory. Returns
+    (results, errors, timings); pass in `results` and `errors` lists to keep
+    what was finished if the scan is cancelled. `memo` (resources.CandleMemo)
+    skips symbols fetched earlier within the current candle. With
+    `confluence` timeframes, only the finest of them and `interval` is
+    downloaded and the rest are resampled from it in the workers.
+    `progress`, a dict, gets running 'done' and 'failed' symbol counts;
+    failed counts every symbol that ends with an error entry.
+    `limiter` (async_fetch.TokenBucket) is shared with other scans of the
+    same exchange; without it the fetch gets a bucket of its own.
+    """
+    timings = timings if timings is not None else StageTimings()
+    pool = get_process_pool(analysis_workers)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=queue_size)
+    results = results if results is not None else []
+    errors = errors if errors is not None else []
+    progress = progress if progress is not None else {}
+    progress.setdefault('done', 0)
+    progress.setdefault('failed', 0)
+    if confluence:
+        base = base_timeframe([interval, *confluence])
+        analyze, analyze_args = analyze_timeframes_batch, (interval, tuple(confluence), base, min_expected_increase)
+    else:
+        base = interval
+        analyze, analyze_args = analyze_batch, (min_expected_increase,)
+
+    async def put(batch):
+        started = time.perf_counter()
+        await queue.put(batch)
+        timings.add('queue_wait', time.perf_counter() - started)
+
+    async def fetch_stage():
+        batch, size = {}, min(FIRST_BATCH_SIZE, batch_size)
+        with timings.stage('fetch'):
+            async for symbol, klines, error in stream_ohlcv(exchange, symbols, base, since,
+                                                            store=store, concurrency=fetch_concurrency,
+                                                            limiter=limiter, memo=memo, timings=timings):
+                if error is not None:
+                    errors.append((symbol, 'data_fetching_error', f'{type(error).__name__}: {error}'))
+                    progress['failed'] += 1
+                    progress['done'] += 1
+                    continue
+                batch[symbol] = klines
+                if len(batch) >= size:
+                    await put(batch)
+                    batch, size = {}, batch_size
+        if batch:
+            await put(batch)
+        for _ in range(analysis_workers):
+            await queue.put(None)
+
+    async def analysis_stage():
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            batch_results, batch_errors, batch_timings = await loop.run_in_executor(pool, analyze, batch, *analyze_args)
+            timings.add('analysis', time.perf_counter() - started)
+            timings.merge(batch_timings)
+            for result in batch_results:
+                result.exchange = exchange.id
+            results.extend(batch_results)
+            errors.extend(batch_errors)
+            progress['failed'] += len({error[0] for error in batch_errors})
+            progress['done'] += len(batch)
+
+    tasks = [asyncio.create_task(fetch_stage())]
+    tasks += [asyncio.create_task(analysis_stage()) for _ in range(analysis_workers)]
+    try:
+        with timings.stage('total'):
+            await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return results, errors, timings
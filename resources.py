@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+import ccxt
+
+from async_fetch import TokenBucket
+from universe import MarketCache, load_markets_cached
+
+# Markets older than this are still served, but reloaded in a background thread
+MARKET_REFRESH_AFTER = 3600
+# Symbols whose candles are kept in memory, across all exchanges and intervals
+CANDLE_MEMO_ENTRIES = 20_000
+
+
+class ExchangeRegistry:
+    """One ccxt exchange per exchange code, shared by every rerun and session."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._exchanges = {}
+        self._lock = threading.Lock()
+
+    def get(self, exchange_code):
+        with self._lock:
+            exchange = self._exchanges.get(exchange_code)
+            if exchange is not None:
+                self.hits += 1
+                return exchange
+            self.misses += 1
+            exchange = getattr(ccxt, exchange_code)()
+            self._exchanges[exchange_code] = exchange
+            return exchange
+
+
+class RateLimiterRegistry:
+    """One token bucket per exchange code and event loop.
+
+    Scans of one venue running at once, e.g. the scheduler's keys for several
+    intervals after a candle close, draw from the same bucket, so together
+    they stay within the exchange's rateLimit. Buckets hold an asyncio.Lock
+    and so cannot be shared across loops.
+    """
+
+    def __init__(self):
+        self._limiters = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, exchange):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            limiters = self._limiters.setdefault(loop, {})
+            if exchange.id not in limiters:
+                limiters[exchange.id] = TokenBucket.for_exchange(exchange)
+            return limiters[exchange.id]
+
+
+class MarketMemo:
+    """Loaded markets kept on the shared exchange objects.
+
+    Within `refresh_after` seconds markets are served as they are; after that
+    they are still served while one background thread reloads them. Past
+    `ttl` the caller waits for a fresh load.
+    """
+
+    def __init__(self, ttl=None, refresh_after=MARKET_REFRESH_AFTER, disk=None):
+        self.disk = disk if disk is not None else MarketCache()
+        self.ttl = ttl if ttl is not None else self.disk.ttl
+        self.refresh_after = refresh_after
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._loaded_at = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def markets(self, exchange):
+        with self._lock:
+            loaded_at = self._loaded_at.get(exchange.id)
+            age = time.time() - loaded_at if loaded_at is not None else None
+            if age is not None and age < self.ttl and exchange.markets:
+                self.hits += 1
+                if age > self.refresh_after and exchange.id not in self._refreshing:
+                    self._refreshing.add(exchange.id)
+                    threading.Thread(target=self._refresh, args=(exchange,), daemon=True).start()
+                return exchange.markets
+            self.misses += 1
+        markets = load_markets_cached(exchange, self.disk)
+        with self._lock:
+            self._loaded_at[exchange.id] = time.time()
+        return markets
+
+    def _refresh(self, exchange):
+        try:
+            markets = exchange.load_markets(reload=True)
+            self.disk.put(exchange.id, markets)
+            with self._lock:
+                self.refreshes += 1
+                self._loaded_at[exchange.id] = time.time()
+        except Exception:
+            # The old markets stay in place; the next request past refresh_after retries
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(exchange.id)
+
+
+class CandleMemo:
+    """Recently fetched klines per (exchange, symbol, interval), LRU by entry count.
+
+    An entry expires when the candle after its last one opens, so a rescan
+    within the same candle makes no requests.
+    """
+
+    def __init__(self, max_entries=CANDLE_MEMO_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, exchange_id, symbol, interval, since):
+        key = (exchange_id, symbol, interval)
+        with self._lock:
+            entry = self._entries.get(key)
+            # A scan starting earlier than the cached one needs older candles
+            if entry is None or entry['since'] > since or time.time() * 1000 >= entry['expires']:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            klines = entry['klines']
+        return [k for k in klines if k[0] >= since]
+
+    def put(self, exchange_id, symbol, interval, since, klines):
+        if not klines:
+            return
+        interval_ms = ccxt.Exchange.parse_timeframe(interval) * 1000
+        key = (exchange_id, symbol, interval)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = {'since': since, 'klines': klines, 'expires': klines[-1][0] + interval_ms}
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+exchanges = ExchangeRegistry()
+rate_limiters = RateLimiterRegistry()
+market_memo = MarketMemo()
+candle_memo = CandleMemo()
+
+
+def get_exchange(exchange_code):
+    return exchanges.get(exchange_code)
+
+
+def load_markets(exchange):
+    return market_memo.markets(exchange)
+
+
+def stats():
+    return [
+        {'cache': 'exchanges', 'hits': exchanges.hits, 'misses': exchanges.misses},
+        {'cache': 'markets', 'hits': market_memo.hits, 'misses': market_memo.misses,
+         'refreshes': market_memo.refreshes},
+        {'cache': 'candles', 'hits': candle_memo.hits, 'misses': candle_memo.misses},
+    ]
@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from analysis import MIN_CANDLES, MIN_EXPECTED_INCREASE, RESULT_FIELDS, ScanResult, klines_to_frame
+from candle_store import CandleStore
+from metrics import error_summary, scan_metrics, write_metrics, profiled, profile_summary
+from multi_scan import EXCHANGE_SCAN_TIMEOUT, scan_exchanges, merge_results
+from timeframes import TIMEFRAMES, timeframe_ms, base_timeframe, resample_ohlcv
+from universe import MIN_QUOTE_VOLUME, MAX_SPREAD_PCT
+
+# Candles requested per scan, counted back from now
+SCAN_LOOKBACK_DAYS = 51
+# Where the runner writes, and the page looks for, finished scans
+SCAN_RESULTS_DIR = 'scans'
+RESULT_FORMATS = ('.parquet', '.json')
+# Best results kept per scan; the rest are dropped as they arrive
+SCAN_TOP_K = 200
+
+
+def scan_since(lookback_days=SCAN_LOOKBACK_DAYS, now=None, timeframes=()):
+    """Start of the candle window; long enough for MIN_CANDLES of the coarsest of `timeframes`."""
+    now = now or datetime.now(timezone.utc)
+    lookback = timedelta(days=lookback_days)
+    if timeframes:
+        lookback = max(lookback, timedelta(milliseconds=(MIN_CANDLES + 1) * max(map(timeframe_ms, timeframes))))
+    return int((now - lookback).timestamp() * 1000)
+
+
+async def scan(exchange_codes, interval='4h', since=None, store=None, timeout=EXCHANGE_SCAN_TIMEOUT,
+               min_expected_increase=MIN_EXPECTED_INCREASE, min_quote_volume=MIN_QUOTE_VOLUME,
+               max_spread_pct=MAX_SPREAD_PCT, on_done=None, confluence=(), top_k=SCAN_TOP_K, live=None,
+               profile=None, exact=False):
+    """Scan one or more exchanges and return a report dict.
+
+    The report holds the `top_k` best ScanResults, errors, per-exchange
+    status, per-stage timings, and metrics (latency histograms and request
+    counters per exchange) with errors summarised by kind. Nothing is
+    printed or shown; callers decide. `profile` is a path the event loop's
+    cProfile stats are written to. `confluence` lists further timeframes that must show Buy_Signal
+    too. `live` is filled with the per-exchange scans while they run. If the
+    scan is cancelled, the report covers what had finished, with
+    'cancelled' set. With `exact`, results also carry exact-mode prices
+    for orders in `result.exact`, priced from the exchange's price strings.
+    """
+    confluence = [tf for tf in confluence if tf != interval]
+    since = since if since is not None else scan_since(timeframes=[interval, *confluence])
+    started = time.perf_counter()
+    scans = live if live is not None else {}
+    cancelled = False
+    try:
+        with profiled(profile):
+            await scan_exchanges(
+                exchange_codes, interval, since, store, timeout, on_done,
+                screen={'min_quote_volume': min_quote_volume, 'max_spread_pct': max_spread_pct},
+                min_expected_increase=min_expected_increase, confluence=confluence, top_k=top_k, scans=scans,
+                exact=exact,
+            )
+    except asyncio.CancelledError:
+        cancelled = True
+        for s in scans.values():
+            if s['status'] == 'running':
+                s['status'] = 'cancelled'
+    errors = [{'exchange': code, 'symbol': symbol, 'key': key, 'message': message}
+              for code, s in scans.items() for symbol, key, message in s['errors']]
+    return {
+        'cancelled': cancelled,
+        'exchanges': list(exchange_codes),
+        'interval': interval,
+        'confluence': confluence,
+        # Candles actually downloaded; the other timeframes were resampled from them
+        'base_interval': base_timeframe([interval, *confluence]),
+        'since': since,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'seconds': time.perf_counter() - started,
+        'thresholds': {'min_expected_increase': min_expected_increase, 'min_quote_volume': min_quote_volume,
+                       'max_spread_pct': max_spread_pct},
+        'results': merge_results(scans)[:top_k],
+        'errors': errors,
+        'error_summary': error_summary(errors),
+        'status': [{'exchange': code, 'status': s['status'], 'pairs': s['pairs'], 'dropped': sum(s['dropped'].values()),
+                    'done': s['done'], 'failed': s['failed'], 'results': len(s['results']),
+                    'seconds': round(s.get('seconds', time.perf_counter() - started), 2)}
+                   for code, s in scans.items()],
+        'timings': [{'exchange': code, **row} for code, s in scans.items() for row in s['timings'].rows()],
+        'metrics': scan_metrics(scans),
+        # Last ticker prices, so reports of separate exchanges can still be merged with per-venue prices
+        'prices': {code: s['prices'] for code, s in scans.items()},
+    }
+
+
+def merge_reports(reports):
+    """Combine reports of different exchanges into one, ranked like a multi-exchange scan."""
+    prices = {code: p for report in reports for code, p in report.get('prices', {}).items()}
+    # Shaped like scan_exchanges' scans, so one rule ranks both
+    scans = {code: {'results': [], 'prices': p} for code, p in prices.items()}
+    for report in reports:
+        for result in report['results']:
+            scans.setdefault(result.exchange, {'results': [], 'prices': {}})['results'].append(result)
+    results = merge_results(scans)
+
+    merged = {key: [item for report in reports for item in report[key]]
+              for key in ('exchanges', 'errors', 'status', 'timings')}
+    return {
+        **merged,
+        'cancelled': any(report.get('cancelled') for report in reports),
+        'interval': reports[0]['interval'],
+        'confluence': reports[0].get('confluence', []),
+        'base_interval': reports[0].get('base_interval', reports[0]['interval']),
+        'since': min(report['since'] for report in reports),
+        'created': min(report['created'] for report in reports),
+        'seconds': max(report['seconds'] for report in reports),
+        'results': results,
+        'error_summary': error_summary(merged['errors']),
+        'metrics': {code: m for report in reports for code, m in report.get('metrics', {}).items()},
+        'prices': prices,
+    }
+
+
+def run_scan(exchange_codes, **kwargs):
+    return asyncio.run(scan(exchange_codes, **kwargs))
+
+
+# ScanResult slots holding lists or dicts, kept as JSON strings in Parquet files
+NESTED_RESULT_FIELDS = ['venues', 'timeframes', 'exact']
+
+
+def results_frame(results):
+    columns = RESULT_FIELDS + ['exchange']
+    return pd.DataFrame([r.as_dict() for r in results], columns=columns)
+
+
+def write_results(report, path):
+    """Write a report as Parquet (results table, the rest in its metadata) or JSON."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    meta = {key: value for key, value in report.items() if key != 'results'}
+    tmp = path + '.tmp'
+    if path.endswith('.parquet'):
+        df = results_frame(report['results'])
+        for field in NESTED_RESULT_FIELDS:
+            df[field] = [json.dumps(getattr(r, field)) for r in report['results']]
+        df.attrs['scan'] = json.dumps(meta)
+        # Needs pyarrow or fastparquet; JSON output has no extra dependency
+        df.to_parquet(tmp, index=False)
+    elif path.endswith('.json'):
+        rows = [{**r.as_dict(), **{field: getattr(r, field) for field in NESTED_RESULT_FIELDS}}
+                for r in report['results']]
+        with open(tmp, 'w') as f:
+            json.dump({**meta, 'results': rows}, f)
+    else:
+        raise ValueError(f'unsupported result format: {path} (use {" or ".join(RESULT_FORMATS)})')
+    # Readers never see a half-written file
+    os.replace(tmp, path)
+
+
+def read_results(path):
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path)
+        report = json.loads(df.attrs.get('scan', '{}'))
+        for field in NESTED_RESULT_FIELDS:
+            if field in df:
+                df[field] = df[field].map(json.loads)
+        rows = df.to_dict('records')
+    else:
+        with open(path) as f:
+            report = json.load(f)
+        rows = report['results']
+    report['results'] = [ScanResult(**row) for row in rows]
+    return report
+
+
+def saved_results(directory=SCAN_RESULTS_DIR):
+    """Finished scan files in `directory`, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(RESULT_FORMATS)]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def chart_series(exchange_id, symbol, interval, since, store=None, base_interval=None):
+    """Chart columns for a result read from a file, rebuilt from the candle store."""
+    from charts import CHART_COLUMNS
+    from indicators import calculate_indicators, calculate_support_resistance
+
+    store = store if store is not None else CandleStore()
+    base_interval = base_interval or interval
+    candles = store.load(exchange_id, symbol, base_interval, since)
+    if len(candles) == 0:
+        return None
+    df = klines_to_frame(candles.tolist())
+    if base_interval != interval:
+        df = resample_ohlcv(df, interval)
+    df = calculate_support_resistance(calculate_indicators(df))
+    return df[CHART_COLUMNS]
+
+
+def print_report(report, top):
+    df = results_frame(report['results'])
+    columns = ['coin_name', 'exchange', 'price', 'expected_increase_percentage', 'entry_price',
+               'take_profit_price', 'stop_loss_price']
+    print(df[columns].head(top).to_string(index=False) if len(df) else 'no results')
+    exact = [{'coin_name': r.coin_name, 'exchange': r.exchange, **r.exact} for r in report['results'] if r.exact]
+    if exact:
+        print()
+        print(pd.DataFrame(exact).head(top).to_string(index=False))
+    print()
+    print(pd.DataFrame(report['status']).to_string(index=False))
+    print()
+    print(pd.DataFrame(report['timings']).to_string(index=False))
+    if report['errors']:
+        summary = pd.DataFrame(report['error_summary'])
+        summary['symbols'] = summary['symbols'].str.join(', ')
+        print()
+        print(summary.to_string(index=False))
+    print(f"\n{len(report['results'])} results in {report['seconds']:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scan exchanges for buy signals without the Streamlit page')
+    parser.add_argument('--exchange', nargs='+', default=['binanceus'], help='ccxt exchange ids')
+    parser.add_argument('--interval', default='4h', choices=TIMEFRAMES)
+    parser.add_argument('--confluence', nargs='*', default=[], choices=TIMEFRAMES,
+                        help='timeframes that must show a buy signal as well, e.g. --interval 4h --confluence 1d')
+    parser.add_argument('--lookback-days', type=float, default=SCAN_LOOKBACK_DAYS)
+    parser.add_argument('--min-increase', type=float, default=MIN_EXPECTED_INCREASE,
+                        help='minimum expected increase, percent')
+    parser.add_argument('--min-volume', type=float, default=MIN_QUOTE_VOLUME, help='minimum 24h quote volume')
+    parser.add_argument('--max-spread', type=float, default=MAX_SPREAD_PCT, help='maximum spread, percent')
+    parser.add_argument('--timeout', type=float, default=EXCHANGE_SCAN_TIMEOUT, help='seconds per exchange')
+    parser.add_argument('--output', help=f'result file, {" or ".join(RESULT_FORMATS)}')
+    parser.add_argument('--top', type=int, default=20, help='results printed')
+    parser.add_argument('--top-k', type=int, default=SCAN_TOP_K, help='results kept')
+    parser.add_argument('--metrics', help='export stage latencies, counters and errors: a .prom file, or JSON lines')
+    parser.add_argument('--profile', help='write cProfile stats of the scan to this path')
+    parser.add_argument('--exact', action='store_true',
+                        help="also price results exactly from the exchange's price strings, rounded for orders")
+    args = parser.parse_args()
+
+    report = run_scan(
+        args.exchange, interval=args.interval,
+        since=scan_since(args.lookback_days, timeframes=[args.interval, *args.confluence]), store=CandleStore(),
+        timeout=args.timeout, min_expected_increase=args.min_increase, min_quote_volume=args.min_volume,
+        max_spread_pct=args.max_spread, confluence=args.confluence, top_k=args.top_k,
+        profile=args.profile, exact=args.exact,
+    )
+    print_report(report, args.top)
+    if args.metrics:
+        write_metrics(report, args.metrics)
+        print(f'metrics written to {args.metrics}')
+    if args.profile:
+        print(profile_summary(args.profile))
+    if args.output:
+        write_results(report, args.output)
+        print(f'written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+import argparse
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import ccxt
+
+from candle_store import CandleStore
+from metrics import write_metrics
+from scanner import SCAN_RESULTS_DIR, scan, write_results, read_results
+from timeframes import TIMEFRAMES, bucket_start, confluence_key
+
+SNAPSHOT_DIR = os.path.join(SCAN_RESULTS_DIR, 'snapshots')
+# Versions kept on disk per (exchange, interval)
+SNAPSHOT_KEEP = 3
+# Seconds after a candle close before scanning, so exchanges have the closed candle
+SCAN_DELAY_AFTER_CLOSE = 30
+# Seconds before a failed scan is tried again
+SCAN_RETRY_AFTER = 300
+# Longest sleep of the scheduling loop, in case the clock jumps
+MAX_SLEEP = 60
+# Seconds a key a page watched keeps being scanned after it was last read
+WATCH_EXPIRY = 2 * 3600
+# 'page' runs the scheduler inside the Streamlit process; 'external' means a
+# separate `python scheduler.py` publishes and the page only reads
+SCHEDULER_MODE = os.environ.get('SCAN_SCHEDULER', 'page')
+# Every published scan appends its stage latencies, counters and error summary here; empty turns it off
+SCAN_METRICS_FILE = os.environ.get('SCAN_METRICS_FILE', os.path.join(SCAN_RESULTS_DIR, 'metrics.jsonl'))
+
+
+def interval_ms(interval):
+    return ccxt.Exchange.parse_timeframe(interval) * 1000
+
+
+def last_close(interval, now_ms=None):
+    """Open time of the running candle, i.e. the close of the last finished one."""
+    now_ms = now_ms if now_ms is not None else time.time() * 1000
+    return int(bucket_start(int(now_ms), interval))
+
+
+def snapshot_complete(snapshot):
+    # Cancelled, timed-out and failed scans are published but not taken as the candle's scan
+    return not snapshot.get('cancelled') and all(s['status'] == 'done' for s in snapshot['status'])
+
+
+def snapshot_age(snapshot):
+    return (datetime.now(timezone.utc) - datetime.fromisoformat(snapshot['created'])).total_seconds()
+
+
+class SnapshotStore:
+    """Versioned scan reports per (exchange, interval): the newest in memory, the last few on disk."""
+
+    def __init__(self, root=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP):
+        self.root = root
+        self.keep = keep
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def directory(self, exchange_code, interval, confluence=()):
+        return os.path.join(self.root, f'{exchange_code}_{interval}' + ''.join(f'+{tf}' for tf in confluence))
+
+    def versions(self, exchange_code, interval, confluence=()):
+        directory = self.directory(exchange_code, interval, confluence)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name for name in os.listdir(directory) if name.startswith('v') and name.endswith('.json'))
+
+    def publish(self, exchange_code, interval, report, candle_close, confluence=()):
+        key = (exchange_code, interval, tuple(confluence))
+        previous = self.latest(exchange_code, interval, confluence)
+        report['version'] = (previous['version'] if previous else 0) + 1
+        report['candle_close'] = candle_close
+        directory = self.directory(exchange_code, interval, confluence)
+        path = os.path.join(directory, f"v{report['version']:08d}.json")
+        write_results(report, path)
+        with self._lock:
+            self._latest[key] = (path, report)
+        for name in self.versions(exchange_code, interval, confluence)[:-self.keep]:
+            os.remove(os.path.join(directory, name))
+        return report
+
+    def latest(self, exchange_code, interval, confluence=()):
+        """Newest snapshot, or None; re-read from disk only when another process published a newer one."""
+        key = (exchange_code, interval, tuple(confluence))
+        versions = self.versions(exchange_code, interval, confluence)
+        path = os.path.join(self.directory(exchange_code, interval, confluence), versions[-1]) if versions else None
+        with self._lock:
+            cached = self._latest.get(key)
+        if cached is not None and (path is None or cached[0] >= path):
+            return cached[1]
+        if path is None:
+            return None
+        report = read_results(path)
+        with self._lock:
+            self._latest[key] = (path, report)
+        return report
+
+
+class ScanScheduler:
+    """Background scans of every watched (exchange, interval, confluence), once per candle close.
+
+    Runs its own event loop in a daemon thread. refresh() merges concurrent
+    requests for the same key into the one scan already in flight. The
+    scheduler is shared by every page session, so a session's cancel only
+    stops a scan nobody else is waiting for.
+    """
+
+    def __init__(self, snapshots=None, store=None, delay=SCAN_DELAY_AFTER_CLOSE, metrics_file=SCAN_METRICS_FILE,
+                 **scan_kwargs):
+        self.snapshots = snapshots if snapshots is not None else SnapshotStore()
+        self.store = store if store is not None else CandleStore()
+        self.delay = delay
+        self.metrics_file = metrics_file
+        self.scan_kwargs = scan_kwargs
+        self.keys = set()
+        self._read_at = {}
+        self._pinned = set()
+        self.scans = 0
+        self.merged = 0
+        self._in_flight = {}
+        self._viewers = {}
+        self._on_demand = {}
+        self._live = {}
+        self._failed_at = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._ready = threading.Event()
+
+    def start(self):
+        threading.Thread(target=lambda: asyncio.run(self._main()), name='scan-scheduler', daemon=True).start()
+        self._ready.wait()
+        return self
+
+    def watch(self, exchange_code, interval, confluence=(), expire=True):
+        """Scan this key at every candle close; with `expire`, only until nobody read it for WATCH_EXPIRY."""
+        key = (exchange_code, interval, tuple(confluence))
+        with self._lock:
+            if expire:
+                self._read_at[key] = time.time()
+            else:
+                self._pinned.add(key)
+            if key in self.keys:
+                return
+            self.keys.add(key)
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def latest(self, exchange_code, interval, confluence=()):
+        key = (exchange_code, interval, tuple(confluence))
+        with self._lock:
+            if key in self._read_at:
+                self._read_at[key] = time.time()
+        return self.snapshots.latest(exchange_code, interval, confluence)
+
+    def in_flight(self, exchange_code, interval, confluence=()):
+        key = (exchange_code, interval, tuple(confluence))
+        future = self._in_flight.get(key)
+        # A cancelled future is done at once, while its scan still publishes what it finished
+        return (future is not None and not future.done()) or key in self._live
+
+    def live(self, exchange_code, interval, confluence=()):
+        """Per-exchange scans of the running refresh, filling up as symbols finish; None when idle."""
+        return self._live.get((exchange_code, interval, tuple(confluence)))
+
+    def cancel(self, exchange_code, interval, confluence=(), viewer=None):
+        """Detach `viewer` from the running refresh and stop it if no other viewer waits for it.
+
+        A scheduled scan keeps running for everyone else unless the key has
+        no snapshot yet. A stopped scan still publishes what it finished,
+        marked cancelled, and the key is scanned again after SCAN_RETRY_AFTER.
+        Returns whether the scan was stopped.
+        """
+        key = (exchange_code, interval, tuple(confluence))
+        with self._lock:
+            future = self._in_flight.get(key)
+            viewers = self._viewers.get(key, set())
+            viewers.discard(viewer)
+            if future is None or future.done() or viewers:
+                return False
+            on_demand = self._on_demand.get(key)
+        if not on_demand and self.snapshots.latest(*key) is not None:
+            return False
+        return future.cancel()
+
+    def refresh(self, exchange_code, interval, confluence=(), viewer=None):
+        """Future of the scan for this key, started unless one is already running.
+
+        `viewer` names the page session asking; scans started by the schedule
+        have none and cannot be cancelled from a page.
+        """
+        key = (exchange_code, interval, tuple(confluence))
+        with self._lock:
+            future = self._in_flight.get(key)
+            if self.in_flight(*key):
+                self.merged += 1
+            else:
+                future = asyncio.run_coroutine_threadsafe(self._scan(*key), self._loop)
+                self._in_flight[key] = future
+                self._viewers[key] = set()
+                self._on_demand[key] = viewer is not None
+                self.scans += 1
+            if viewer is not None:
+                self._viewers[key].add(viewer)
+            return future
+
+    async def _scan(self, exchange_code, interval, confluence):
+        key = (exchange_code, interval, confluence)
+        candle_close = last_close(interval)
+        self._live[key] = live = {}
+        try:
+            report = await scan([exchange_code], interval=interval, store=self.store, confluence=confluence,
+                                live=live, **self.scan_kwargs)
+            if self.metrics_file:
+                await asyncio.to_thread(write_metrics, report, self.metrics_file)
+            if not snapshot_complete(report):
+                # Scanned again after SCAN_RETRY_AFTER
+                self._failed_at[key] = time.time()
+                previous = await asyncio.to_thread(self.snapshots.latest, exchange_code, interval, confluence)
+                if not report['results'] and previous is not None:
+                    # e.g. load_markets failed: the last snapshot stays up rather than an empty one
+                    return previous
+            return await asyncio.to_thread(self.snapshots.publish, exchange_code, interval, report, candle_close,
+                                           confluence)
+        except Exception:
+            self._failed_at[key] = time.time()
+            raise
+        finally:
+            # Dropped only once the snapshot is out, so readers never see neither
+            self._live.pop(key, None)
+
+    def _due_at(self, exchange_code, interval, confluence):
+        # Epoch seconds at which this key next needs a scan
+        snapshot = self.snapshots.latest(exchange_code, interval, confluence)
+        close = last_close(interval)
+        if snapshot is not None and snapshot.get('candle_close', 0) >= close and snapshot_complete(snapshot):
+            close += interval_ms(interval)
+        due = close / 1000 + self.delay
+        failed_at = self._failed_at.get((exchange_code, interval, confluence))
+        if failed_at is not None:
+            due = max(due, failed_at + SCAN_RETRY_AFTER)
+        return due
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._ready.set()
+        while True:
+            now = time.time()
+            with self._lock:
+                expired = {key for key in self.keys
+                           if key not in self._pinned and now - self._read_at.get(key, now) > WATCH_EXPIRY}
+                self.keys -= expired
+                for key in expired:
+                    self._read_at.pop(key, None)
+                keys = list(self.keys)
+            sleep = MAX_SLEEP
+            for key in keys:
+                if self.in_flight(*key):
+                    continue
+                due = await asyncio.to_thread(self._due_at, *key)
+                if due <= now:
+                    self.refresh(*key)
+                else:
+                    sleep = min(sleep, due - now)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), sleep)
+            except asyncio.TimeoutError:
+                pass
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(**scan_kwargs):
+    """The process-wide scheduler, started on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ScanScheduler(**scan_kwargs).start()
+        return _scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish a scan snapshot after every candle close')
+    parser.add_argument('--exchange', nargs='+', default=['binanceus'], help='ccxt exchange ids')
+    parser.add_argument('--interval', nargs='+', default=['4h'], choices=TIMEFRAMES)
+    parser.add_argument('--confluence', nargs='*', default=[], choices=TIMEFRAMES,
+                        help='timeframes that must show a buy signal as well')
+    args = parser.parse_args()
+
+    # Keyed like the page's keys, so SCAN_SCHEDULER=external pages find the snapshots
+    keys = [(exchange_code, interval, confluence_key(interval, args.confluence))
+            for exchange_code in args.exchange for interval in args.interval]
+    scheduler = get_scheduler()
+    for key in keys:
+        scheduler.watch(*key, expire=False)
+    while True:
+        time.sleep(MAX_SLEEP)
+        for exchange_code, interval, confluence in keys:
+            snapshot = scheduler.latest(exchange_code, interval, confluence)
+            if snapshot is not None:
+                print(f"{exchange_code} {interval} v{snapshot['version']}: {len(snapshot['results'])} results, "
+                      f"{snapshot_age(snapshot):.0f}s old", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+DB_FILE = "randevular.db"
+# Bookings written by earlier versions; imported once into an empty database
+JSON_FILE = "randevular.json"
+DEFAULT_DURUM = "Beklemede"
+ONAY = "Onaylandı"
+IPTAL = "İptal Edildi"
+DURUMLAR = [DEFAULT_DURUM, ONAY, IPTAL]
+# Seconds a writer waits for another writer's lock before giving up
+BUSY_TIMEOUT = 30
+# Connections kept open per database file
+POOL_SIZE = 4
+# Page cache per connection, KiB (negative means KiB to SQLite)
+CACHE_SIZE_KIB = 16384
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS randevular (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ad TEXT NOT NULL,
+        telefon TEXT NOT NULL,
+        tarih TEXT NOT NULL,
+        saat TEXT NOT NULL,
+        masaj_turu TEXT NOT NULL,
+        durum TEXT NOT NULL DEFAULT 'Beklemede',
+        olusturma TEXT NOT NULL
+    )""",
+    # One live booking per slot; a cancelled booking frees its slot
+    f"""CREATE UNIQUE INDEX IF NOT EXISTS randevular_slot ON randevular (tarih, saat)
+        WHERE durum != '{IPTAL}'""",
+]
+COLUMNS = ("id", "ad", "telefon", "tarih", "saat", "masaj_turu", "durum", "olusturma")
+# Slots freed by a cancel or delete, in order, so other processes' availability indexes can follow
+FREED_SLOTS_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS bosalan_saatler (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tarih TEXT NOT NULL,
+        saat TEXT NOT NULL
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS randevu_iptal AFTER UPDATE OF durum ON randevular
+        WHEN NEW.durum = '{IPTAL}' AND OLD.durum != '{IPTAL}'
+        BEGIN INSERT INTO bosalan_saatler (tarih, saat) VALUES (OLD.tarih, OLD.saat); END""",
+    f"""CREATE TRIGGER IF NOT EXISTS randevu_silme AFTER DELETE ON randevular
+        WHEN OLD.durum != '{IPTAL}'
+        BEGIN INSERT INTO bosalan_saatler (tarih, saat) VALUES (OLD.tarih, OLD.saat); END""",
+]
+
+
+class SlotTakenError(Exception):
+    """The slot was booked by someone else first."""
+
+
+def connect(path=DB_FILE, json_file=JSON_FILE, migrations=None):
+    """Open a connection with the pragmas every user of the file needs, and bring its schema up to date.
+
+    `migrations` defaults to the bookings schema; each step runs once, in
+    order, and the count of applied steps is kept in PRAGMA user_version.
+    """
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    # WAL lets readers go on while one writer commits; NORMAL syncs at checkpoints only
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    migrate(conn, migrations if migrations is not None else booking_migrations(json_file))
+    return conn
+
+
+def booking_migrations(json_file=JSON_FILE):
+    def create_schema(conn):
+        for statement in SCHEMA:
+            conn.execute(statement)
+        import_json(conn, json_file)
+
+    return [
+        create_schema,
+        "CREATE INDEX IF NOT EXISTS randevular_tarih ON randevular (tarih, saat)",
+        "CREATE INDEX IF NOT EXISTS randevular_durum ON randevular (durum, tarih, saat)",
+        *FREED_SLOTS_SCHEMA,
+    ]
+
+
+def migrate(conn, migrations):
+    """Apply the migrations past the database's user_version, all in one transaction."""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= len(migrations):
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Another process may have migrated while this one waited for the lock
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for step in migrations[version:]:
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(step)
+        conn.execute(f"PRAGMA user_version = {max(version, len(migrations))}")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def import_json(conn, json_file=JSON_FILE):
+    """Copy bookings from the old JSON file; returns (imported, skipped double bookings)."""
+    if not json_file or not os.path.exists(json_file):
+        return 0, 0
+    try:
+        with open(json_file, 'r') as f:
+            randevular = json.load(f)
+    except json.JSONDecodeError:
+        return 0, 0
+    imported = 0
+    for r in randevular:
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO randevular (ad, telefon, tarih, saat, masaj_turu, durum, olusturma) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (r.get("ad", ""), r.get("telefon", ""), str(r["tarih"]), str(r["saat"]), r.get("masaj_turu", ""),
+             r.get("durum", DEFAULT_DURUM), datetime.now().isoformat(timespec='seconds')),
+        )
+        imported += cursor.rowcount
+    return imported, len(randevular) - imported
+
+
+class ConnectionPool:
+    """Open connections to one database file, shared by all threads and kept across reruns.
+
+    A connection is lent to one thread at a time. Keeping it open keeps its
+    pragmas, page cache and sqlite3's prepared-statement cache warm.
+    """
+
+    def __init__(self, path, size=POOL_SIZE, **connect_kwargs):
+        self.path = path
+        self.size = size
+        self.connect_kwargs = connect_kwargs
+        self.opened = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self.opened < self.size
+                if can_open:
+                    self.opened += 1
+            conn = self._open() if can_open else self._idle.get()
+        try:
+            yield conn
+        finally:
+            # A borrower that failed mid-transaction must not hand its locks to the next one
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._idle.put(conn)
+
+    def _open(self):
+        try:
+            return connect(self.path, **self.connect_kwargs)
+        except BaseException:
+            with self._lock:
+                self.opened -= 1
+            raise
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=DB_FILE, **connect_kwargs):
+    """The process-wide pool for `path`; modules outlive Streamlit reruns, so the pool does too."""
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = ConnectionPool(path, **connect_kwargs)
+        return _pools[path]
+
+
+@contextmanager
+def _connection(conn):
+    if conn is not None:
+        yield conn
+    else:
+        with get_pool().connection() as conn:
+            yield conn
+
+
+def filter_clause(date_column, status_column, start=None, end=None, statuses=None, search=None, search_columns=()):
+    """WHERE clause and parameters for an optional inclusive date range, a set of statuses and a text search.
+
+    `search` matches anywhere in any of `search_columns`, case-insensitively for ASCII.
+    """
+    clauses, params = [], []
+    if start is not None:
+        clauses.append(f"{date_column} >= ?")
+        params.append(str(start))
+    if end is not None:
+        clauses.append(f"{date_column} <= ?")
+        params.append(str(end))
+    if statuses:
+        clauses.append(f"{status_column} IN ({', '.join('?' * len(statuses))})")
+        params.extend(statuses)
+    if search and search_columns:
+        pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        clauses.append("(" + " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in search_columns) + ")")
+        params.extend([pattern] * len(search_columns))
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def add_randevu(ad, telefon, tarih, saat, masaj_turu, conn=None):
+    """Insert one booking and return its id; raises SlotTakenError if the slot is already booked."""
+    with _connection(conn) as conn:
+        try:
+            cursor = conn.execute(
+                "INSERT INTO randevular (ad, telefon, tarih, saat, masaj_turu, durum, olusturma) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ad, telefon, str(tarih), str(saat), masaj_turu, DEFAULT_DURUM,
+                 datetime.now().isoformat(timespec='seconds')),
+            )
+        except sqlite3.IntegrityError as e:
+            raise SlotTakenError(f"{tarih} {saat}") from e
+        return cursor.lastrowid
+
+
+def _randevu_filter(start=None, end=None, durumlar=None, arama=None):
+    return filter_clause("tarih", "durum", start, end, durumlar, arama, ("ad", "telefon"))
+
+
+def count_randevular(start=None, end=None, durumlar=None, arama=None, conn=None):
+    where, params = _randevu_filter(start, end, durumlar, arama)
+    with _connection(conn) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM randevular{where}", params).fetchone()[0]
+
+
+def get_randevu_page(start=None, end=None, durumlar=None, arama=None, limit=50, offset=0, conn=None):
+    """One page of the matching bookings, newest first."""
+    where, params = _randevu_filter(start, end, durumlar, arama)
+    with _connection(conn) as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM randevular{where} ORDER BY tarih DESC, saat DESC, id DESC "
+            "LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        )
+        return [dict(row) for row in rows]
+
+
+def get_randevular_by_id(randevu_ids, conn=None):
+    if not randevu_ids:
+        return {}
+    with _connection(conn) as conn:
+        rows = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM randevular WHERE id IN "
+                            f"({', '.join('?' * len(randevu_ids))})", list(randevu_ids))
+        return {row["id"]: dict(row) for row in rows}
+
+
+def get_dolu_saatler(conn=None):
+    """(tarih, saat) of every booking still holding its slot."""
+    with _connection(conn) as conn:
+        return conn.execute("SELECT tarih, saat FROM randevular WHERE durum != ?", (IPTAL,)).fetchall()
+
+
+def last_freed_id(conn=None):
+    with _connection(conn) as conn:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM bosalan_saatler").fetchone()[0]
+
+
+def get_bosalan_saatler(after_id, conn=None):
+    """(id, tarih, saat) of slots freed by a cancel or delete after `after_id`, oldest first."""
+    with _connection(conn) as conn:
+        return conn.execute("SELECT id, tarih, saat FROM bosalan_saatler WHERE id > ? ORDER BY id",
+                            (after_id,)).fetchall()
+
+
+def update_randevu_statuses(randevu_ids, yeni_durum, only_durum=None, conn=None):
+    """Set the status of many bookings in one write; returns how many changed.
+
+    With `only_durum`, bookings in any other status are left alone. A
+    booking whose slot someone else now holds keeps its status.
+    """
+    if not randevu_ids:
+        return 0
+    sql = f"UPDATE OR IGNORE randevular SET durum = ? WHERE id IN ({', '.join('?' * len(randevu_ids))})"
+    params = [yeni_durum] + list(randevu_ids)
+    if only_durum is not None:
+        sql += " AND durum = ?"
+        params.append(only_durum)
+    with _connection(conn) as conn:
+        return conn.execute(sql, params).rowcount
+
+
+def delete_randevular(randevu_ids, conn=None):
+    if not randevu_ids:
+        return 0
+    with _connection(conn) as conn:
+        return conn.execute(f"DELETE FROM randevular WHERE id IN ({', '.join('?' * len(randevu_ids))})",
+                            list(randevu_ids)).rowcount
+
+
+def _stress_writer(path, writer, attempts, slots, seed):
+    conn = connect(path, json_file=None)
+    rng = random.Random(seed)
+    booked = 0
+    for i in range(attempts):
+        tarih, saat = rng.choice(slots)
+        try:
+            add_randevu(f"writer {writer}", str(i), tarih, saat, "stress", conn=conn)
+            booked += 1
+        except SlotTakenError:
+            pass
+    conn.close()
+    return booked
+
+
+def stress(writers=16, attempts=200, days=30, path=None):
+    """Many processes booking random slots of a small calendar at once.
+
+    Returns (attempts, booked, rows, double bookings, seconds); every slot
+    must be booked at most once and every successful insert must be stored.
+    """
+    from availability import SLOTS
+
+    directory = None
+    if path is None:
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, DB_FILE)
+    connect(path, json_file=None).close()
+    first = date.today()
+    slots = [(str(first + timedelta(days=d)), saat) for d in range(days) for saat in SLOTS]
+
+    started = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(writers) as pool:
+        booked = sum(pool.starmap(_stress_writer, [(path, w, attempts, slots, w) for w in range(writers)]))
+    seconds = time.perf_counter() - started
+
+    conn = connect(path, json_file=None)
+    rows = conn.execute("SELECT COUNT(*) FROM randevular").fetchone()[0]
+    doubles = conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM randevular GROUP BY tarih, saat "
+                           "HAVING COUNT(*) > 1)").fetchone()[0]
+    conn.close()
+    if directory is not None:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+    return writers * attempts, booked, rows, doubles, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Booking storage: JSON migration and a concurrent writer stress run')
+    sub = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = sub.add_parser('migrate', help=f'import {JSON_FILE} into {DB_FILE}')
+    migrate_parser.add_argument('--db', default=DB_FILE)
+    migrate_parser.add_argument('--json', default=JSON_FILE)
+    stress_parser = sub.add_parser('stress', help='many processes booking the same slots at once')
+    stress_parser.add_argument('--writers', type=int, default=16)
+    stress_parser.add_argument('--attempts', type=int, default=200, help='bookings tried per writer')
+    stress_parser.add_argument('--days', type=int, default=30, help='calendar days the writers compete for')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        conn = connect(args.db, json_file=args.json)
+        print(f"{args.db}: {conn.execute('SELECT COUNT(*) FROM randevular').fetchone()[0]} bookings")
+    else:
+        attempts, booked, rows, doubles, seconds = stress(args.writers, args.attempts, args.days)
+        print(f"{attempts} attempts by {args.writers} writers in {seconds:.2f}s: {booked} booked, "
+              f"{attempts - booked} refused as taken, {rows} stored, {doubles} double bookings")
+        if rows != booked or doubles:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
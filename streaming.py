@@ -0,0 +1,441 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+from indicators import (
+    SMA_WINDOW, BOLLINGER_WINDOW, RSI_TIME_PERIOD, MACD_FAST_PERIOD, MACD_SLOW_PERIOD,
+    MACD_SIGNAL_PERIOD, ATR_PERIOD, STOCH_FASTK_PERIOD, STOCH_SLOWK_PERIOD,
+    SUPPORT_RESISTANCE_WINDOW,
+)
+from analysis import MIN_EXPECTED_INCREASE, expected_prices
+
+# Combined-stream endpoints speaking Binance's kline message format
+KLINE_STREAM_URLS = {
+    'binance': 'wss://stream.binance.com:9443/stream',
+    'binanceus': 'wss://stream.binance.us:9443/stream',
+}
+# Binance allows at most 1024 streams per connection
+STREAMS_PER_CONNECTION = 1000
+# Closed candles kept per symbol
+ROLLING_WINDOW = 300
+
+
+# O(1)-per-candle building blocks. Each reproduces the pandas call used in
+# indicators.calculate_indicators for the newest row.
+
+class RollingStats:
+    """rolling(window).mean() / .std() over a stream, NaN until the window is full."""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nans = 0
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.same_run = 0
+
+    def push(self, x):
+        # Like pandas, a window of identical values gives that value exactly
+        self.same_run = self.same_run + 1 if self.values and x == self.values[-1] else 1
+        self.values.append(x)
+        self._add(x, 1)
+        if len(self.values) > self.window:
+            self._add(self.values.popleft(), -1)
+
+    def _add(self, x, sign):
+        # Welford update run forwards to add a value, backwards to drop one
+        if math.isnan(x):
+            self.nans += sign
+            return
+        self.count += sign
+        if self.count == 0:
+            self._mean = self._m2 = 0.0
+            return
+        delta = x - self._mean
+        self._mean += sign * delta / self.count
+        self._m2 += sign * delta * (x - self._mean)
+
+    @property
+    def ready(self):
+        return len(self.values) == self.window and self.nans == 0
+
+    @property
+    def mean(self):
+        if not self.ready:
+            return math.nan
+        return self.values[-1] if self.same_run >= self.window else self._mean
+
+    @property
+    def std(self):
+        if not self.ready or self.window < 2:
+            return math.nan
+        if self.same_run >= self.window:
+            return 0.0
+        return math.sqrt(max(self._m2, 0.0) / (self.window - 1))
+
+
+class RollingExtreme:
+    """rolling(window).min() or .max() with a monotonic deque."""
+
+    def __init__(self, window, maximum=False):
+        self.window = window
+        self.maximum = maximum
+        self.index = 0
+        self.candidates = deque()
+
+    def push(self, x):
+        better = (lambda a, b: a >= b) if self.maximum else (lambda a, b: a <= b)
+        while self.candidates and better(x, self.candidates[-1][1]):
+            self.candidates.pop()
+        self.candidates.append((self.index, x))
+        if self.candidates[0][0] <= self.index - self.window:
+            self.candidates.popleft()
+        self.index += 1
+
+    @property
+    def value(self):
+        return self.candidates[0][1] if self.index >= self.window else math.nan
+
+
+class Ema:
+    """ewm(span, adjust=False).mean(), seeded with the first value."""
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1)
+        self.value = math.nan
+
+    def push(self, x):
+        self.value = x if math.isnan(self.value) else self.alpha * x + (1 - self.alpha) * self.value
+
+
+class IncrementalIndicators:
+    """Indicator state for one symbol, advanced one closed candle at a time."""
+
+    def __init__(self):
+        self.sma = RollingStats(SMA_WINDOW)
+        self.ema = Ema(SMA_WINDOW)
+        self.bollinger = RollingStats(BOLLINGER_WINDOW)
+        self.gain = RollingStats(RSI_TIME_PERIOD)
+        self.loss = RollingStats(RSI_TIME_PERIOD)
+        self.ema_fast = Ema(MACD_FAST_PERIOD)
+        self.ema_slow = Ema(MACD_SLOW_PERIOD)
+        self.macd_signal = Ema(MACD_SIGNAL_PERIOD)
+        self.true_range = RollingStats(ATR_PERIOD)
+        self.lowest_low = RollingExtreme(STOCH_FASTK_PERIOD)
+        self.highest_high = RollingExtreme(STOCH_FASTK_PERIOD, maximum=True)
+        self.stoch_d = RollingStats(STOCH_SLOWK_PERIOD)
+        self.support = RollingExtreme(SUPPORT_RESISTANCE_WINDOW)
+        self.resistance = RollingExtreme(SUPPORT_RESISTANCE_WINDOW, maximum=True)
+        self.candles = deque(maxlen=ROLLING_WINDOW)
+        self.prev_close = math.nan
+        self.last = {}
+
+    @classmethod
+    def from_klines(cls, klines):
+        state = cls()
+        for kline in klines:
+            state.update(kline)
+        return state
+
+    @property
+    def last_timestamp(self):
+        return self.candles[-1][0] if self.candles else None
+
+    def update(self, kline):
+        timestamp, _, high, low, close, _ = kline[:6]
+        self.candles.append(tuple(kline[:6]))
+
+        self.sma.push(close)
+        self.ema.push(close)
+        self.bollinger.push(close)
+
+        delta = close - self.prev_close
+        # Matches Series.where(): the first, undefined, delta counts as 0
+        self.gain.push(delta if delta > 0 else 0.0)
+        self.loss.push(-delta if delta < 0 else 0.0)
+
+        self.ema_fast.push(close)
+        self.ema_slow.push(close)
+        macd_line = self.ema_fast.value - self.ema_slow.value
+        self.macd_signal.push(macd_line)
+
+        if math.isnan(self.prev_close):
+            true_range = high - low
+        else:
+            true_range = max(high, self.prev_close) - min(low, self.prev_close)
+        self.true_range.push(true_range)
+        self.prev_close = close
+
+        self.lowest_low.push(low)
+        self.highest_high.push(high)
+        price_range = self.highest_high.value - self.lowest_low.value
+        # A flat window is 0/0, which pandas turns into NaN
+        stoch_k = 100 * (close - self.lowest_low.value) / price_range if price_range != 0 else math.nan
+        self.stoch_d.push(stoch_k)
+
+        self.support.push(low)
+        self.resistance.push(high)
+
+        bb_std = self.bollinger.std
+        gain, loss = self.gain.mean, self.loss.mean
+        if loss == 0:
+            rs = math.nan if gain == 0 else math.inf
+        else:
+            rs = gain / loss
+        sma = self.sma.mean
+        values = {
+            'timestamp': timestamp,
+            'close': close,
+            'SMA_50': sma,
+            'EMA_50': self.ema.value,
+            'BB_Middle': self.bollinger.mean,
+            'BB_Upper': self.bollinger.mean + 2 * bb_std,
+            'BB_Lower': self.bollinger.mean - 2 * bb_std,
+            'RSI': 100 - (100 / (1 + rs)),
+            'MACD_Line': macd_line,
+            'MACD_Signal': self.macd_signal.value,
+            'ATR': self.true_range.mean,
+            '%K': stoch_k,
+            '%D': self.stoch_d.mean,
+            'Support': self.support.value,
+            'Resistance': self.resistance.value,
+        }
+        values['Buy_Signal'] = (close > sma) and (macd_line > values['MACD_Signal']) and (stoch_k > values['%D']) and (stoch_k > 20)
+        values['Sell_Signal'] = (close < sma) and (values['RSI'] > 70)
+        self.last = values
+        return values
+
+
+def parse_kline_message(message):
+    """Return (market_id, kline, close_time, closed) from a kline stream message."""
+    payload = json.loads(message)
+    data = payload.get('data', payload)
+    if data.get('e') != 'kline':
+        return None
+    k = data['k']
+    kline = [k['t'], float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v'])]
+    return data['s'], kline, k['T'], k['x']
+
+
+class StreamingScanner:
+    """Applies closed candles to per-symbol indicator state and reports new buy hits.
+
+    A hit is pushed once, on the candle where Buy_Signal and the expected
+    increase filter start to hold; it is reported again only after clearing.
+    """
+
+    def __init__(self, on_signal, symbols=None, min_expected_increase=MIN_EXPECTED_INCREASE):
+        self.on_signal = on_signal
+        # market id (e.g. BTCUSDT) -> ccxt symbol (BTC/USDT); unknown ids stream under their own name
+        self.symbols = symbols or {}
+        self.min_expected_increase = min_expected_increase
+        self.states = {}
+        self.hits = set()
+
+    def warm_up(self, market_id, klines):
+        self.states[market_id] = IncrementalIndicators.from_klines(klines)
+
+    def handle(self, message):
+        parsed = parse_kline_message(message)
+        if parsed is None:
+            return None
+        market_id, kline, close_time, closed = parsed
+        if not closed:
+            return None
+        return self.apply(market_id, kline, close_time)
+
+    def apply(self, market_id, kline, close_time):
+        """Add a closed candle to the symbol's state; candles at or before its last one are ignored."""
+        state = self.states.setdefault(market_id, IncrementalIndicators())
+        if state.last_timestamp is not None and kline[0] <= state.last_timestamp:
+            return None
+        values = state.update(kline)
+
+        close, sma = values['close'], values['SMA_50']
+        _, expected_increase = expected_prices(close, sma)
+        if not (values['Buy_Signal'] and expected_increase >= self.min_expected_increase):
+            self.hits.discard(market_id)
+            return None
+        if market_id in self.hits:
+            return None
+        self.hits.add(market_id)
+        signal = {
+            'coin_name': self.symbols.get(market_id, market_id),
+            'timestamp': kline[0],
+            'price': close,
+            'expected_increase_percentage': float(expected_increase),
+            'sma_50': sma,
+            'rsi_14': values['RSI'],
+            'macd_line': values['MACD_Line'],
+            'macd_signal': values['MACD_Signal'],
+            'atr': values['ATR'],
+            'stoch_k': values['%K'],
+            'stoch_d': values['%D'],
+            # Seconds between the candle closing and the hit being pushed
+            'latency': time.time() - close_time / 1000,
+        }
+        self.on_signal(signal)
+        return signal
+
+
+async def listen(url, streams, scanner, record=None, reconnect=True, on_reconnect=None):
+    """Feed stream messages to the scanner, reconnecting after a drop.
+
+    `on_reconnect` is awaited after subscribing again and before the next
+    message, so the candles that closed while disconnected (see backfill)
+    are applied in order rather than skipped.
+    """
+    import websockets
+
+    connected = False
+    while True:
+        try:
+            async with websockets.connect(url, max_size=None) as websocket:
+                for i in range(0, len(streams), 200):
+                    await websocket.send(json.dumps({'method': 'SUBSCRIBE', 'params': streams[i:i + 200], 'id': i + 1}))
+                if connected and on_reconnect is not None:
+                    await on_reconnect()
+                connected = True
+                async for message in websocket:
+                    if record is not None:
+                        record.write(message + '\n')
+                    scanner.handle(message)
+        except (websockets.ConnectionClosed, OSError):
+            pass
+        if not reconnect:
+            return
+        await asyncio.sleep(1)
+
+
+async def fetch_closed(exchange_code, symbols, interval, since, store=None):
+    # REST klines from `since` on per market id of `symbols`, without the still-open last candle
+    import ccxt
+    from async_fetch import create_async_exchange, stream_ohlcv
+
+    step = ccxt.Exchange.parse_timeframe(interval) * 1000
+    now = time.time() * 1000
+    market_ids = {s: m for m, s in symbols.items()}
+    exchange = create_async_exchange(exchange_code)
+    try:
+        async for symbol, klines, error in stream_ohlcv(exchange, list(market_ids), interval, since, store=store):
+            if error is None and klines:
+                # The stream will deliver the open candle's close
+                yield market_ids[symbol], [k for k in klines if k[0] + step <= now]
+    finally:
+        await exchange.close()
+
+
+async def warm_up(scanner, exchange_code, symbols, interval, store=None):
+    # Seed each symbol with REST history so indicators are ready on the first streamed close
+    import ccxt
+
+    since = int(time.time() * 1000 - ROLLING_WINDOW * ccxt.Exchange.parse_timeframe(interval) * 1000)
+    async for market_id, klines in fetch_closed(exchange_code, symbols, interval, since, store):
+        scanner.warm_up(market_id, klines)
+
+
+async def backfill(scanner, exchange_code, symbols, interval, store=None):
+    """Apply the candles of `symbols` that closed while the stream was down, oldest first.
+
+    Without them the next streamed close would be taken as adjacent to the
+    last one seen, and every rolling window would be off from then on.
+    """
+    import ccxt
+
+    step = ccxt.Exchange.parse_timeframe(interval) * 1000
+    lasts = [scanner.states[m].last_timestamp for m in symbols if m in scanner.states]
+    lasts = [last for last in lasts if last is not None]
+    if not lasts:
+        return
+    async for market_id, klines in fetch_closed(exchange_code, symbols, interval, min(lasts) + 1, store):
+        for kline in klines:
+            scanner.apply(market_id, kline, kline[0] + step - 1)
+
+
+async def run_streaming(exchange_code, interval, on_signal, url=None, record_path=None, warm=True):
+    import ccxt
+    from candle_store import CandleStore
+
+    url = url or KLINE_STREAM_URLS.get(exchange_code)
+    if url is None:
+        raise ValueError(f'No kline stream known for {exchange_code}')
+    exchange = getattr(ccxt, exchange_code)()
+    markets = exchange.load_markets()
+    symbols = {m['id']: s for s, m in markets.items() if s.endswith('/USDT') and m.get('active', True)}
+    scanner = StreamingScanner(on_signal, symbols)
+    store = CandleStore()
+    if warm:
+        await warm_up(scanner, exchange_code, symbols, interval, store=store)
+
+    market_ids = list(symbols)
+    record = open(record_path, 'a') if record_path else None
+
+    def connection(ids):
+        streams = [f'{market_id.lower()}@kline_{interval}' for market_id in ids]
+        gap = {m: symbols[m] for m in ids}
+        return listen(url, streams, scanner, record,
+                      on_reconnect=lambda: backfill(scanner, exchange_code, gap, interval, store))
+
+    try:
+        await asyncio.gather(*[
+            connection(market_ids[i:i + STREAMS_PER_CONNECTION])
+            for i in range(0, len(market_ids), STREAMS_PER_CONNECTION)
+        ])
+    finally:
+        if record is not None:
+            record.close()
+
+
+async def replay_server(path, host='localhost', port=8765, delay=0.0):
+    """Serve recorded stream messages (one JSON message per line) to every client."""
+    import websockets
+
+    with open(path) as f:
+        messages = [line.rstrip('\n') for line in f if line.strip()]
+
+    async def handler(websocket, *args):
+        for message in messages:
+            await websocket.send(message)
+            if delay:
+                await asyncio.sleep(delay)
+
+    return await websockets.serve(handler, host, port)
+
+
+async def replay(path, port, on_signal, delay=0.0):
+    # Runs the scanner against a local replay of `path` and returns once it has been consumed
+    server = await replay_server(path, port=port, delay=delay)
+    try:
+        scanner = StreamingScanner(on_signal)
+        await listen(f'ws://localhost:{port}', [], scanner, reconnect=False)
+        return scanner
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def print_signal(signal):
+    print(json.dumps(signal), flush=True)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Stream kline closes and print new buy signals as JSON lines')
+    parser.add_argument('--exchange', default='binanceus')
+    parser.add_argument('--interval', default='4h')
+    parser.add_argument('--url', help='override the websocket endpoint')
+    parser.add_argument('--record', help='append every received message to this file')
+    parser.add_argument('--no-warm-up', action='store_true', help='skip REST history, start from empty windows')
+    parser.add_argument('--replay', help='replay a recorded file through a local server instead of connecting out')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds between replayed messages')
+    args = parser.parse_args()
+
+    if args.replay:
+        asyncio.run(replay(args.replay, args.port, print_signal, args.delay))
+    else:
+        asyncio.run(run_streaming(args.exchange, args.interval, print_signal, args.url, args.record, not args.no_warm_up))
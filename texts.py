@@ -0,0 +1,107 @@
+# Localization dictionaries
+TEXTS = {
+    'en': {
+        'title': 'XTraderBot Spot Analysis',
+        'select_exchange': 'Select Exchange',
+        'time_interval': 'Time Interval',
+        'start_analysis': 'Start Analysis',
+        'insufficient_data': 'Insufficient data',
+        'error_initializing_exchange': 'Error initializing exchange',
+        'data_fetching_error': 'Data fetching error',
+        'error_fetching_pairs': 'Error fetching USDT pairs',
+        'no_usdt_pairs': 'No USDT pairs found.',
+        'total_pairs': 'Total pairs fetched',
+        'total_coins_analyzed': 'Total coins analyzed',
+        'current_price': 'Current Price',
+        'expected_price': 'Expected Price',
+        'expected_increase_percentage': 'Expected Increase Percentage',
+        'sma_50': 'SMA 50',
+        'rsi_14': 'RSI 14',
+        'macd_line': 'MACD Line',
+        'macd_signal': 'MACD Signal',
+        'bb_upper_band': 'BB Upper Band',
+        'bb_middle_band': 'BB Middle Band',
+        'bb_lower_band': 'BB Lower Band',
+        'atr': 'ATR',
+        'stochastic_k': 'Stochastic %K',
+        'stochastic_d': 'Stochastic %D',
+        'entry_price': 'Entry Price',
+        'take_profit_price': 'Take Profit Price',
+        'stop_loss_price': 'Stop Loss Price',
+        'processing_error': 'Processing error',
+        'stage_timings': 'Stage timings',
+        'request_counters': 'Requests per exchange',
+        'chart_render': 'Chart rendering',
+        'show_chart': 'Show chart',
+        'pairs_screened_out': 'Pairs screened out',
+        'all_exchanges': 'All exchanges',
+        'venue_prices': 'Prices by exchange',
+        'exchange_status': 'Exchange status',
+        'cache_stats': 'Cache statistics',
+        'saved_scans': 'Saved scans',
+        'errors': 'Errors',
+        'show_saved_scan': 'Show a saved scan',
+        'snapshot_age': 'Snapshot age',
+        'refresh_running': 'refresh in progress',
+        'waiting_first_scan': 'Waiting for the first scan to finish',
+        'confluence': 'Also require a buy signal on',
+        'confirmed_timeframes': 'Buy signal on',
+        'failed': 'failed',
+        'live_results': 'Best results so far',
+        'cancel_scan': 'Cancel scan',
+        'scan_cancelled': 'cancelled, partial results',
+        'plot': 'data:image/png;base64,{}'
+    },
+    'tr': {
+        'title': 'XTraderBot Spot Analizi',
+        'select_exchange': 'Borsa Seçiniz',
+        'time_interval': 'Zaman Aralığı',
+        'start_analysis': 'Analiz Başlat',
+        'insufficient_data': 'Yetersiz veri',
+        'error_initializing_exchange': 'Borsa başlatma hatası',
+        'data_fetching_error': 'Veri çekme hatası',
+        'error_fetching_pairs': 'USDT paritesi çekme hatası',
+        'no_usdt_pairs': 'USDT paritesi bulunamadı.',
+        'total_pairs': 'Toplam çekilen parite sayısı',
+        'total_coins_analyzed': 'Analiz edilen toplam coin sayısı',
+        'current_price': 'Mevcut Fiyat',
+        'expected_price': 'Beklenen Fiyat',
+        'expected_increase_percentage': 'Beklenen Artış Yüzdesi',
+        'sma_50': 'SMA 50',
+        'rsi_14': 'RSI 14',
+        'macd_line': 'MACD Çizgisi',
+        'macd_signal': 'MACD Sinyali',
+        'bb_upper_band': 'BB Üst Bandı',
+        'bb_middle_band': 'BB Orta Bandı',
+        'bb_lower_band': 'BB Alt Bandı',
+        'atr': 'ATR',
+        'stochastic_k': 'Stokastik %K',
+        'stochastic_d': 'Stokastik %D',
+        'entry_price': 'Giriş Fiyatı',
+        'take_profit_price': 'Kar Alma Fiyatı',
+        'stop_loss_price': 'Zarar Durdur Fiyatı',
+        'processing_error': 'İşleme hatası',
+        'stage_timings': 'Aşama süreleri',
+        'request_counters': 'Borsa başına istekler',
+        'chart_render': 'Grafik çizimi',
+        'show_chart': 'Grafiği göster',
+        'pairs_screened_out': 'Elenen parite sayısı',
+        'all_exchanges': 'Tüm borsalar',
+        'venue_prices': 'Borsalara göre fiyatlar',
+        'exchange_status': 'Borsa durumu',
+        'cache_stats': 'Önbellek istatistikleri',
+        'saved_scans': 'Kayıtlı taramalar',
+        'errors': 'Hatalar',
+        'show_saved_scan': 'Kayıtlı bir taramayı göster',
+        'snapshot_age': 'Tarama yaşı',
+        'refresh_running': 'yenileniyor',
+        'waiting_first_scan': 'İlk taramanın bitmesi bekleniyor',
+        'confluence': 'Ayrıca al sinyali aranan zaman aralıkları',
+        'confirmed_timeframes': 'Al sinyali olan zaman aralıkları',
+        'failed': 'hatalı',
+        'live_results': 'Şimdiye kadarki en iyi sonuçlar',
+        'cancel_scan': 'Taramayı iptal et',
+        'scan_cancelled': 'iptal edildi, kısmi sonuçlar',
+        'plot': 'data:image/png;base64,{}'
+    }
+}
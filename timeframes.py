@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+import ccxt
+
+from analysis import (
+    MIN_CANDLES, MIN_EXPECTED_INCREASE, ANALYSIS_BLOCK_SYMBOLS, analyze_frames, parse_klines, processing_error,
+)
+from indicators import stack_ohlcv, batch_indicators
+from timings import StageTimings
+
+# Timeframes the scan offers; any of them can be built from a finer one
+TIMEFRAMES = ['1h', '4h', '1d', '1w']
+# Exchanges start weekly candles on Monday 00:00 UTC; the epoch was a Thursday
+WEEK_OFFSET_MS = 4 * 86_400_000
+
+
+def timeframe_ms(timeframe):
+    return ccxt.Exchange.parse_timeframe(timeframe) * 1000
+
+
+def _offset_ms(timeframe):
+    return WEEK_OFFSET_MS if timeframe.endswith('w') else 0
+
+
+def bucket_start(ts, timeframe):
+    """Open time, in ms, of the `timeframe` candle holding `ts` (an int or an array), aligned like exchanges."""
+    step, offset = timeframe_ms(timeframe), _offset_ms(timeframe)
+    return (ts - offset) // step * step + offset
+
+
+def confluence_key(interval, confluence):
+    # Snapshot key order: finest first, without `interval` or repeats, so the page and the scheduler agree
+    return tuple(sorted({tf for tf in confluence if tf != interval}, key=timeframe_ms))
+
+
+def base_timeframe(timeframes):
+    """The finest of `timeframes`; every other one must be a whole multiple of it."""
+    base = min(timeframes, key=timeframe_ms)
+    for timeframe in timeframes:
+        if timeframe.endswith(('M', 'y')) or timeframe_ms(timeframe) % timeframe_ms(base):
+            raise ValueError(f'{timeframe} cannot be built from {base} candles')
+    return base
+
+
+def resample_ohlcv(df, timeframe):
+    """Aggregate an OHLCV frame into `timeframe` candles (open first, high max, low min, close last, volume sum).
+
+    Candles are aligned the way exchanges align them. A leading candle that
+    started before the first base candle is dropped; the last one may still
+    be running, like the last candle an exchange returns.
+    """
+    if df.empty:
+        return df
+    ts = df.index.to_numpy().astype('datetime64[ms]').astype(np.int64)
+    bucket = bucket_start(ts, timeframe)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    if bucket[0] != ts[0]:
+        if len(starts) == 1:
+            return df.iloc[:0]
+        df, bucket = df.iloc[starts[1]:], bucket[starts[1]:]
+        starts = starts[1:] - starts[1]
+    ends = np.r_[starts[1:], len(df)] - 1
+    return pd.DataFrame({
+        'open': df['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(df['high'].to_numpy(), starts),
+        'low': np.minimum.reduceat(df['low'].to_numpy(), starts),
+        'close': df['close'].to_numpy()[ends],
+        'volume': np.add.reduceat(df['volume'].to_numpy(), starts),
+    }, index=pd.to_datetime(bucket[starts], unit='ms').rename(df.index.name))
+
+
+def resample_frames(frames, timeframe, base):
+    if timeframe == base:
+        return frames
+    return {symbol: resample_ohlcv(df, timeframe) for symbol, df in frames.items()}
+
+
+def last_buy_signals(frames, block_size=ANALYSIS_BLOCK_SYMBOLS):
+    """Symbols whose last candle carries Buy_Signal, computed with the batch engine."""
+    buying = set()
+    symbols = list(frames)
+    for i in range(0, len(symbols), block_size):
+        panel = batch_indicators(stack_ohlcv({s: frames[s] for s in symbols[i:i + block_size]}))
+        buying.update(s for s, buy in zip(panel['symbols'], panel['Buy_Signal'][-1]) if buy)
+    return buying
+
+
+def analyze_timeframes(frames, interval, confluence=(), base=None, timings=None,
+                       min_expected_increase=MIN_EXPECTED_INCREASE):
+    """Scan `interval` candles built from `base` frames, keeping symbols that also show Buy_Signal on `confluence`.
+
+    Each timeframe is resampled locally from the one download, so exchange
+    requests do not grow with the number of timeframes. Results list the
+    timeframes they were confirmed on in `result.timeframes`.
+    """
+    timings = timings if timings is not None else StageTimings()
+    base = base or base_timeframe([interval, *confluence])
+    confirmed, errors = set(frames), []
+    for timeframe in [*confluence, interval]:
+        with timings.stage('resample'):
+            resampled = resample_frames({s: df for s, df in frames.items() if s in confirmed}, timeframe, base)
+        short = {s for s, df in resampled.items() if len(df) < MIN_CANDLES}
+        errors += [(symbol, 'insufficient_data', timeframe) for symbol in short]
+        confirmed -= short
+        if timeframe != interval:
+            with timings.stage('confluence'):
+                confirmed &= last_buy_signals(resampled)
+
+    results, analysis_errors = analyze_frames({s: df for s, df in resampled.items() if s in confirmed}, timings,
+                                              min_expected_increase=min_expected_increase)
+    for result in results:
+        result.timeframes = [interval, *confluence]
+    return results, errors + analysis_errors
+
+
+def analyze_timeframes_batch(klines_by_symbol, interval, confluence, base, min_expected_increase=MIN_EXPECTED_INCREASE):
+    # Process pool entry point, like analysis.analyze_batch but for base candles
+    timings = StageTimings()
+    frames, errors = parse_klines(klines_by_symbol, timings)
+    try:
+        results, analysis_errors = analyze_timeframes(frames, interval, confluence, base, timings,
+                                                      min_expected_increase)
+    except Exception:
+        # Resampling and the confluence checks run over the whole batch; find the symbol that broke them
+        results, analysis_errors = [], []
+        for symbol, df in frames.items():
+            try:
+                symbol_results, symbol_errors = analyze_timeframes({symbol: df}, interval, confluence, base, timings,
+                                                                   min_expected_increase)
+            except Exception as e:
+                symbol_results, symbol_errors = [], [processing_error(symbol, e)]
+            results += symbol_results
+            analysis_errors += symbol_errors
+    return results, errors + analysis_errors, timings.as_dict()
@@ -0,0 +1,80 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets; the last catches everything slower
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+
+class StageTimings:
+    """Wall-clock seconds, call counts and latency histograms per pipeline stage, plus plain counters.
+
+    Counters are for events that take no time of their own: requests,
+    retries, rate-limit hits, bytes received.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, count=1, buckets=None):
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.counts[stage] += count
+            if buckets is None:
+                # `count` calls taking `seconds` together are binned at their mean
+                self.buckets[stage][bisect.bisect_left(LATENCY_BUCKETS, seconds / count)] += count
+            else:
+                merged = self.buckets[stage]
+                for i, n in enumerate(buckets):
+                    merged[i] += n
+
+    def incr(self, counter, value=1):
+        with self._lock:
+            self.counters[counter] += value
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def merge(self, other):
+        # `other` is the as_dict() output of timings recorded in another process
+        for stage, entry in other.items():
+            self.add(stage, entry['seconds'], entry['count'], entry.get('buckets'))
+
+    def as_dict(self):
+        with self._lock:
+            return {stage: {'seconds': self.seconds[stage], 'count': self.counts[stage],
+                            'buckets': list(self.buckets[stage])} for stage in self.seconds}
+
+    def counters_dict(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def rows(self):
+        return [
+            {'stage': stage, 'seconds': round(entry['seconds'], 3), 'count': entry['count'],
+             'p50': quantile(entry['buckets'], 0.5), 'p95': quantile(entry['buckets'], 0.95)}
+            for stage, entry in self.as_dict().items()
+        ]
+
+
+def quantile(buckets, q):
+    """Upper bound of the histogram bucket holding quantile q, or None when empty or past the last bound."""
+    total = sum(buckets)
+    if not total:
+        return None
+    seen = 0
+    for bound, n in zip(LATENCY_BUCKETS, buckets):
+        seen += n
+        if seen >= q * total:
+            return bound if bound != float('inf') else None
@@ -0,0 +1,115 @@
+import json
+import os
+import time
+
+MARKET_CACHE_DIR = 'market_cache'
+# load_markets is one of the heaviest ccxt calls; listings change slowly
+MARKET_CACHE_TTL = 6 * 3600
+# 24h volume in USDT below which a pair is not worth a candle download
+MIN_QUOTE_VOLUME = 50_000
+# Bid/ask spread, in percent of the ask, above which a pair is treated as illiquid
+MAX_SPREAD_PCT = 2.0
+
+
+class MarketCache:
+    """load_markets() results on disk, one JSON file per exchange."""
+
+    def __init__(self, root=MARKET_CACHE_DIR, ttl=MARKET_CACHE_TTL):
+        self.root = root
+        self.ttl = ttl
+
+    def path(self, exchange_id):
+        return os.path.join(self.root, f'{exchange_id}.json')
+
+    def get(self, exchange_id):
+        try:
+            with open(self.path(exchange_id)) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - cached['fetched_at'] > self.ttl:
+            return None
+        return cached['markets']
+
+    def put(self, exchange_id, markets):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.path(exchange_id) + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'fetched_at': time.time(), 'markets': markets}, f)
+        os.replace(tmp, self.path(exchange_id))
+
+
+def load_markets_cached(exchange, cache=None):
+    cache = cache if cache is not None else MarketCache()
+    markets = cache.get(exchange.id)
+    if markets is not None:
+        exchange.set_markets(markets)
+        return exchange.markets
+    markets = exchange.load_markets()
+    cache.put(exchange.id, markets)
+    return markets
+
+
+def is_active_usdt_spot(market):
+    return (
+        market.get('quote') == 'USDT'
+        and market.get('active') is not False
+        and market.get('spot', True) is not False
+    )
+
+
+def quote_volume(ticker):
+    if ticker.get('quoteVolume') is not None:
+        return ticker['quoteVolume']
+    if ticker.get('baseVolume') is not None and ticker.get('last') is not None:
+        return ticker['baseVolume'] * ticker['last']
+    return None
+
+
+def spread_pct(ticker):
+    bid, ask = ticker.get('bid'), ticker.get('ask')
+    if not bid or not ask:
+        return None
+    return (ask - bid) / ask * 100
+
+
+def screen_with_tickers(exchange, min_quote_volume=MIN_QUOTE_VOLUME, max_spread_pct=MAX_SPREAD_PCT, cache=None,
+                        markets=None):
+    """USDT spot pairs that are active and liquid enough to be worth scanning.
+
+    Returns (symbols, dropped, tickers): dropped counts the pairs removed per
+    reason, tickers are the fetched tickers by symbol. Pass `markets` when
+    they are already loaded, e.g. by resources.load_markets.
+    """
+    if markets is None:
+        markets = load_markets_cached(exchange, cache)
+    symbols = [s for s, m in markets.items() if s.endswith('/USDT')]
+    dropped = {'inactive': 0, 'no_ticker': 0, 'low_volume': 0, 'wide_spread': 0}
+
+    active = []
+    for symbol in symbols:
+        if is_active_usdt_spot(markets[symbol]):
+            active.append(symbol)
+        else:
+            dropped['inactive'] += 1
+
+    if not exchange.has.get('fetchTickers'):
+        return active, dropped, {}
+    tickers = exchange.fetch_tickers()
+
+    kept = []
+    for symbol in active:
+        ticker = tickers.get(symbol)
+        if ticker is None:
+            dropped['no_ticker'] += 1
+            continue
+        volume = quote_volume(ticker)
+        if volume is not None and volume < min_quote_volume:
+            dropped['low_volume'] += 1
+            continue
+        spread = spread_pct(ticker)
+        if spread is not None and spread > max_spread_pct:
+            dropped['wide_spread'] += 1
+            continue
+        kept.append(symbol)
+    return kept, dropped, tickers